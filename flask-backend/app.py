@@ -1,22 +1,28 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from extensions import db
+from extensions import db, migrate
 from flask_jwt_extended import JWTManager
-from sqlalchemy import inspect
+import click
+import importlib
 import logging
 from config import Config
-from database.init_db import init_db
-from routes.skin_analysis import skin_analysis_bp
-from models.skin_analysis import SkinAnalysis
-from migrations.create_skin_analyses import create_skin_analyses_table
-from migrations.add_annotated_image import add_annotated_image_column
 
 from flask import send_from_directory
 import os
 from nanoid import generate  # Import nanoid
 from flask_jwt_extended import JWTManager
 
-from models.ingredient import populate_ingredients
+from database.bootstrap import bootstrap_database
+from services.log_setup import configure_logging
+from services.model_registry import model_registry
+from services.inference_scheduler import scheduler_stats
+from services.inference_server import inference_server_stats
+from services.cache import enhancement_cache_stats, prediction_cache_stats
+from services.image_store import get_image_store
+from services.job_queue import get_job_queue, job_queue_stats
+from services.llm_gateway import llm_gateway_stats
+from services.metrics import format_counters, format_gauges, init_metrics, metrics_enabled, metrics_registry
+from services.nutrition_rollup import rebuild_rollups
 
 
 app = Flask(__name__, static_folder='uploads')
@@ -48,75 +54,171 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Initialize extensions
 db.init_app(app)
+migrate.init_app(app, db)
+init_metrics(app)
 jwt = JWTManager(app)
 cors = CORS()
 cors.init_app(app)
 jwt = JWTManager(app)
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 
-# Import and register Blueprints
-from routes.user import user_bp
-from routes.ohamodel import ohamodel_bp
+@app.teardown_request
+def rollback_failed_request(exc):
+    """Rolls back whatever an unhandled exception left in the session before it is removed."""
+    if exc is not None:
+        db.session.rollback()
+
+
+# Set up logging (queued, structured, per-module levels)
+configure_logging(app.config)
+
+# Blueprints that can be served by this instance: name -> (module, blueprint, url prefix, models used)
+BLUEPRINTS = {
+    'user': ('routes.user', 'user_bp', '/user', []),
+    'ohamodel': ('routes.ohamodel', 'ohamodel_bp', '/ohamodel', ['oha']),
+    'dpmodel': ('routes.dpmodel', 'dpmodel_bp', '/dpmodel', ['dp']),
+    'acnemodel': ('routes.acnemodel', 'acnemodel_bp', '/acnemodel', ['acne']),
+    'skin_analysis': ('routes.skin_analysis', 'skin_analysis_bp', '/skin-analysis', []),
+    'foodmodel': ('routes.foodmodel', 'foodmodel_bp', '/foodmodel', ['food_classifier', 'food_ingredients']),
+    'gpt': ('routes.gpt', 'gpt_bp', '/gpt', []),
+    'auth': ('routes.auth', 'auth_bp', '/auth', []),
+    'history': ('routes.history', 'history_bp', '/history', []),
+    'jobs': ('routes.jobs', 'jobs_bp', '/jobs', []),
+}
+
+
+def parse_name_list(value, all_names):
+    """Parses a comma separated config value, where 'all' means every name and 'none' means nothing."""
+    value = (value or '').strip().lower()
+    if value in ('', 'none'):
+        return []
+    if value == 'all':
+        return list(all_names)
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+# Import and register Blueprints (only the ones enabled for this instance)
+enabled_blueprints = parse_name_list(app.config['ENABLED_BLUEPRINTS'], BLUEPRINTS)
+enabled_models = []
+for blueprint_name in enabled_blueprints:
+    if blueprint_name not in BLUEPRINTS:
+        raise ValueError(f"Unknown blueprint in ENABLED_BLUEPRINTS: {blueprint_name}")
+    module_name, attribute, url_prefix, model_names = BLUEPRINTS[blueprint_name]
+    blueprint = getattr(importlib.import_module(module_name), attribute)
+    app.register_blueprint(blueprint, url_prefix=url_prefix)
+    enabled_models.extend(model_names)
+logging.info(f"Enabled blueprints: {enabled_blueprints}")
+
+# Load models up front only when asked to; otherwise they load on first request
+model_registry.warm_up(parse_name_list(app.config['WARM_UP_MODELS'], enabled_models))
+
+
+@app.route('/models/status', methods=['GET'])
+def get_models_status():
+    return jsonify({
+        'enabled_blueprints': enabled_blueprints,
+        'models': {name: status for name, status in model_registry.status().items() if name in enabled_models}
+    })
+
+
+@app.route('/models/warm-up', methods=['POST'])
+def warm_up_models():
+    data = request.get_json(silent=True) or {}
+    names = [name for name in data.get('models', enabled_models) if name in enabled_models]
+    model_registry.warm_up(names)
+    return jsonify({'models': {name: model_registry.status()[name] for name in names}})
+
+
+@app.route('/models/inference-stats', methods=['GET'])
+def get_inference_stats():
+    return jsonify({
+        'schedulers': scheduler_stats(),
+        'inference_server': inference_server_stats(),
+        'prediction_cache': prediction_cache_stats(),
+        'enhancement_cache': enhancement_cache_stats(),
+        'jobs': job_queue_stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request and stage latency histograms plus service gauges, in the Prometheus text format."""
+    if not metrics_enabled():
+        return jsonify({'error': 'Metrics are disabled'}), 404
+
+    schedulers = scheduler_stats()
+    caches = {'prediction': prediction_cache_stats(), 'enhancement': enhancement_cache_stats()}
+    caches = {name: stats for name, stats in caches.items() if stats}
+    llm = llm_gateway_stats() or {}
+    jobs = job_queue_stats()
+    inference_server = inference_server_stats()
+    pool = db.engine.pool
+
+    lines = metrics_registry.render()
+    lines += format_counters('inference_batches_total', [({'model': s['model']}, s['batches']) for s in schedulers])
+    lines += format_counters('inference_images_total', [({'model': s['model']}, s['images']) for s in schedulers])
+    lines += format_gauges('inference_queued', [({'model': s['model']}, s['queued']) for s in schedulers])
+    lines += format_gauges('inference_avg_queue_wait_ms', [({'model': s['model']}, s['avg_queue_wait_ms']) for s in schedulers])
+    lines += format_counters('cache_hits_total', [({'cache': name}, stats['hits']) for name, stats in caches.items()])
+    lines += format_counters('cache_misses_total', [({'cache': name}, stats['misses']) for name, stats in caches.items()])
+    lines += format_gauges('cache_entries', [({'cache': name}, stats['entries']) for name, stats in caches.items()])
+    lines += format_gauges('llm_in_flight', [({'provider': name}, stats['in_flight']) for name, stats in llm.items()])
+    lines += format_counters('llm_rejected_total', [({'provider': name}, stats['rejected']) for name, stats in llm.items()])
+    if jobs:
+        lines += format_gauges('jobs', [({'status': status}, count) for status, count in jobs['jobs'].items()])
+    if inference_server:
+        lines += format_gauges('inference_server_alive_workers', [({}, inference_server['alive'])])
+        lines += format_gauges('inference_server_in_flight', [({}, inference_server['in_flight'])])
+        lines += format_counters('inference_server_errors_total', [({}, inference_server['errors'])])
+    if hasattr(pool, 'checkedout'):
+        # Only QueuePool (MySQL, PostgreSQL) tracks these
+        lines += format_gauges('db_pool_checked_out', [({}, pool.checkedout())])
+        lines += format_gauges('db_pool_overflow', [({}, pool.overflow())])
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
-app.register_blueprint(user_bp, url_prefix='/user')
-app.register_blueprint(ohamodel_bp, url_prefix='/ohamodel')
-
-
-from routes.dpmodel import dpmodel_bp
-app.register_blueprint(dpmodel_bp, url_prefix='/dpmodel')
-
-from routes.acnemodel import acnemodel_bp
-app.register_blueprint(acnemodel_bp, url_prefix='/acnemodel')
+# Import models here for Alembic
+from models import *
 
-app.register_blueprint(skin_analysis_bp, url_prefix='/skin-analysis')
+# Create tables and seed data once per schema version; worker processes can skip this entirely
+if not app.config['SKIP_DB_BOOTSTRAP']:
+    with app.app_context():
+        bootstrap_database()
 
 
-from routes.foodmodel import foodmodel_bp
-app.register_blueprint(foodmodel_bp, url_prefix='/foodmodel')
+@app.cli.command('bootstrap-db')
+def bootstrap_db_command():
+    """Creates missing tables and upserts seed data regardless of the recorded schema version."""
+    bootstrap_database(force=True)
 
-from routes.gpt import gpt_bp
-app.register_blueprint(gpt_bp, url_prefix='/gpt')
 
-from routes.auth import auth_bp
-app.register_blueprint(auth_bp, url_prefix='/auth')
+@app.cli.command('rebuild-nutrition-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user (defaults to everyone).')
+def rebuild_nutrition_rollups_command(user_id):
+    """Recomputes the daily nutrition rollups from the stored food scans."""
+    rows = rebuild_rollups(user_id)
+    click.echo(f"Wrote {rows} daily nutrition rollup rows")
 
-from routes.history import history_bp
-app.register_blueprint(history_bp, url_prefix='/history')
 
-# Import models here for Alembic
-from models import *
+@app.cli.command('run-jobs')
+@click.option('--workers', type=int, default=None, help='Worker threads (defaults to JOB_WORKERS, at least 1).')
+def run_jobs_command(workers):
+    """Runs queued ?async=1 jobs in this process until interrupted."""
+    job_queue = get_job_queue(start_workers=False)
+    job_queue.workers = workers or max(job_queue.workers, 1)
+    job_queue.start()
+    logging.info(f"Running jobs from {job_queue.path} with {job_queue.workers} workers")
+    try:
+        job_queue.join()
+    except KeyboardInterrupt:
+        job_queue.stop()
 
-# new one (2)
-# Function to dynamically check and create all tables 
-def create_all_tables():
-    with app.app_context():
-        try:
-            # Get the list of existing tables in the database
-            inspector = inspect(db.engine)
-            existing_tables = inspector.get_table_names()
-
-            # Get all models registered with SQLAlchemy
-            mappers = db.Model.registry.mappers
-            required_tables = [mapper.class_.__tablename__ for mapper in mappers]
-
-            # Check if any required table is missing
-            if not all(table in existing_tables for table in required_tables):
-                logging.info('Creating missing tables...')
-                logging.info(f'Expected tables: {required_tables}')
-                logging.info(f'Existing tables: {existing_tables}')
-                db.create_all()
-            else:
-                logging.info('All required tables exist.')
-        except Exception as e:
-            logging.error(f"Error during table creation: {e}")
-            raise
-
-        populate_ingredients()
-
-create_all_tables()
 
+@app.route('/images/<key>', methods=["GET"])
+def get_stored_image(key):
+    try:
+        path = get_image_store().path(key)
+    except (ValueError, NotImplementedError):
+        return jsonify({"error": "Image not found"}), 404
+    return send_from_directory(os.path.dirname(path), os.path.basename(path), max_age=31536000)
 
 @app.route('/uploads/<filename>', methods=["GET"])
 def get_uploaded_file(filename):
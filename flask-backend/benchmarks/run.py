@@ -0,0 +1,306 @@
+"""
+Load-test and benchmark driver for the Flask backend.
+
+Starts the app in-process on a threaded server with a local SQLite database and
+a stub OpenAI/Gemini server, seeds a benchmark user and history rows, then runs
+each scenario with a fixed number of concurrent clients and reports throughput,
+p50/p95/p99 latency and peak RSS.
+
+Run from flask-backend/:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 16 --requests 500 --scenarios identify_food,dp_predict
+    python -m benchmarks.run --url http://localhost:3001 --scenarios food_history   # an already running server
+    python -m benchmarks.run --json results.json
+
+Prediction and enhancement caches are disabled unless --cache is given, since
+the same sample image is sent on every request.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.stub_llm import STUB_COMPLETION, StubLLMServer
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+DP_RECORD = {
+    'gender': 1, 'age': 52, 'currentSmoker': 1, 'cigsPerDay': 10, 'BPMeds': 0, 'prevalentStroke': 0,
+    'prevalentHyp': 1, 'diabetes': 0, 'sysBP': 148, 'diaBP': 92, 'BMI': 27.5,
+}
+
+
+def image_upload(field, context):
+    return {field: (os.path.basename(context['image_path']), context['image_bytes'], 'image/jpeg')}
+
+
+# name -> function(session, base_url, context) returning a requests.Response
+SCENARIOS = {
+    'identify_food': lambda session, url, context: session.post(
+        f"{url}/foodmodel/identify-food", files=image_upload('image', context)),
+    'acne_predict': lambda session, url, context: session.post(
+        f"{url}/acnemodel/predict", files=image_upload('file', context)),
+    'oha_predict': lambda session, url, context: session.post(
+        f"{url}/ohamodel/predict", files=image_upload('file', context)),
+    'dp_predict': lambda session, url, context: session.post(
+        f"{url}/dpmodel/predictData", json={'data': [{**DP_RECORD, 'user_id': context['user_id']}]}),
+    'food_history': lambda session, url, context: session.get(
+        f"{url}/foodmodel/api/foodscans/{context['user_id']}", params={'limit': 20}),
+    'dp_history': lambda session, url, context: session.get(
+        f"{url}/dpmodel/history/{context['user_id']}", params={'limit': 20}),
+    'oha_history': lambda session, url, context: session.get(
+        f"{url}/history/oha/get-history", params={'user_id': context['user_id'], 'limit': 20}),
+    'skin_history': lambda session, url, context: session.get(
+        f"{url}/skin-analysis/history", params={'user_id': context['user_id'], 'limit': 20}),
+    'user_login': lambda session, url, context: session.post(
+        f"{url}/user/login", json={'email': BENCHMARK_EMAIL, 'password': BENCHMARK_PASSWORD}),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Comma separated scenarios to run (default: all)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients per scenario')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests sent first (loads models)')
+    parser.add_argument('--image', default=os.path.join('uploads', 'nasi_lemak.jpeg'), help='Sample image to upload')
+    parser.add_argument('--history-rows', type=int, default=200, help='History rows seeded per table')
+    parser.add_argument('--llm-latency-ms', type=float, default=300, help='Delay added by the stub LLM server')
+    parser.add_argument('--cache', action='store_true', help='Keep the prediction and enhancement caches enabled')
+    parser.add_argument('--url', help='Benchmark an already running server instead of starting one')
+    parser.add_argument('--user-id', type=int, default=1, help='User id for history scenarios with --url')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, work_dir, llm_server):
+    """Points the app at throwaway storage and the stub LLM server; must run before `app` is imported."""
+    os.environ.update({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}",
+        'SECRET_KEY': os.environ.get('SECRET_KEY') or 'benchmark-secret-key-0123456789abcdef',
+        'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY') or 'benchmark-secret-key-0123456789abcdef',
+        'OPENAI_API_KEY': 'stub',
+        'OPENAI_BASE_URL': llm_server.openai_base_url,
+        'GEMINI_BASE_URL': llm_server.base_url,
+        'RYAN_API_KEY': 'stub',
+        'GREGORY_GEMINI_API_KEY': 'stub',
+        'IMAGE_STORE_DIR': os.path.join(work_dir, 'images'),
+        'JOB_QUEUE_PATH': os.path.join(work_dir, 'jobs.sqlite3'),
+        'FOOD_SAVE_UPLOADS': 'false',
+        'FOOD_SAVE_ANNOTATED': 'false',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+    })
+    if not args.cache:
+        os.environ['PREDICTION_CACHE_ENABLED'] = 'false'
+        os.environ['ENHANCEMENT_CACHE_ENABLED'] = 'false'
+
+
+def seed_database(app, history_rows):
+    """Creates the benchmark user and `history_rows` rows in each history table; returns the user id."""
+    from extensions import db
+    from models.foodscan import FoodScan
+    from models.HealthPrediction import HealthPrediction
+    from models.oral_analysis_history import OralAnalysisHistory
+    from models.skin_analysis import SkinAnalysis
+    from models.user import User
+
+    with app.app_context():
+        user = User(username='benchmark', email=BENCHMARK_EMAIL, password=BENCHMARK_PASSWORD, role='user')
+        user.set_password(BENCHMARK_PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        for index in range(history_rows):
+            timestamp = now - timedelta(minutes=index)
+            db.session.add(FoodScan(
+                user_id=user.id, food_name='Nasi Lemak', food_image='/uploads/nasi_lemak.jpeg',
+                ingredients=STUB_COMPLETION, timestamp=timestamp))
+            db.session.add(HealthPrediction(
+                user_id=user.id, gender=1, age=52, current_smoker=1, cigs_per_day=10, bp_meds=0,
+                prevalent_stroke=0, prevalent_hyp=1, diabetes=0, sys_bp=148, dia_bp=92, bmi=27.5,
+                risk_score=42.0, risk_level='Moderate', confidence=0.42, created_at=timestamp))
+            oral_analysis = OralAnalysisHistory(
+                user_id=user.id, original_image_path='/uploads/oha/sample.jpg',
+                predictions=[{'pred_class': 0, 'confidence': 0.9}], condition_count=1)
+            oral_analysis.analysis_date = timestamp
+            db.session.add(oral_analysis)
+            db.session.add(SkinAnalysis(
+                user_id=user.id, image_url='/uploads/skin_analysis/sample.jpg',
+                predictions=[{'class': 0, 'confidence': 0.9}], notes='', timestamp=timestamp))
+        db.session.commit()
+        return user.id
+
+
+def start_app_server():
+    """Imports the app (after configure_environment) and serves it on a threaded local server."""
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='benchmark-app', daemon=True).start()
+    return app, server, f"http://127.0.0.1:{server.server_port}"
+
+
+class RSSSampler:
+    """Samples this process's resident set size in the background and keeps the peak (Linux /proc)."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_bytes():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            # ru_maxrss is the lifetime peak, in kilobytes on Linux and bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_bytes = self.current_bytes()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(name, base_url, context, concurrency, total_requests, warmup, measure_rss):
+    scenario = SCENARIOS[name]
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def one_request(_):
+        started = time.perf_counter()
+        try:
+            response = scenario(session(), base_url, context)
+            ok = 200 <= response.status_code < 300
+            status = response.status_code
+        except requests.RequestException as e:
+            ok, status = False, type(e).__name__
+        return time.perf_counter() - started, ok, status
+
+    for _ in range(warmup):
+        one_request(None)
+
+    with RSSSampler() if measure_rss else contextlib.nullcontext() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"bench-{name}") as executor:
+            outcomes = list(executor.map(one_request, range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, ok, _ in outcomes if ok)
+    statuses = {}
+    for _, _, status in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        'scenario': name,
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'errors': total_requests - len(latencies),
+        'statuses': statuses,
+        'duration_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'peak_rss_mb': round(sampler.peak_bytes / 1024 / 1024, 1) if sampler else None,
+        # Worker processes (e.g. the inference server) report their own peak separately
+        'children_peak_rss_mb': round(children_kb / 1024, 1) if measure_rss and children_kb else None,
+    }
+
+
+def print_results(results):
+    columns = ['scenario', 'ok', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb']
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        if result['errors']:
+            print(f"{result['scenario']}: non-2xx/failed responses by status: {result['statuses']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+
+    with open(args.image, 'rb') as f:
+        context = {'image_path': args.image, 'image_bytes': f.read(), 'user_id': args.user_id}
+
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as work_dir:
+        llm_server = None
+        app_server = None
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            llm_server = StubLLMServer(latency_ms=args.llm_latency_ms).start()
+            configure_environment(args, work_dir, llm_server)
+            app, app_server, base_url = start_app_server()
+            context['user_id'] = seed_database(app, args.history_rows)
+
+        results = []
+        try:
+            for name in names:
+                print(f"Running {name} ({args.requests} requests, concurrency {args.concurrency})...", flush=True)
+                results.append(run_scenario(
+                    name, base_url, context, args.concurrency, args.requests, args.warmup,
+                    measure_rss=not args.url))
+        finally:
+            if app_server:
+                app_server.shutdown()
+            if llm_server:
+                llm_server.shutdown()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
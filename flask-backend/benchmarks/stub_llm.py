@@ -0,0 +1,115 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Returned for every OpenAI chat completion; a flat JSON list, the shape enhance_gpt() parses
+STUB_COMPLETION = json.dumps([
+    {"name": "rice", "quantity": 1, "calories": 206, "protein": 4.3, "carbohydrates": 45, "fats": 0.4},
+    {"name": "egg", "quantity": 1, "calories": 78, "protein": 6.3, "carbohydrates": 0.6, "fats": 5.3},
+])
+STUB_GEMINI_TEXT = "This is a stubbed Gemini response used for benchmarking."
+
+GEMINI_PATH = re.compile(r'^/v1beta/models/[^/:]+:(generateContent|streamGenerateContent)')
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers OpenAI chat completion and Gemini generateContent requests with canned responses."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests += 1
+
+        path = self.path.split('?', 1)[0]
+        if path.endswith('/chat/completions'):
+            request = json.loads(body or b'{}')
+            if request.get('stream'):
+                self._send_openai_stream(request)
+            else:
+                self._send_json(self._openai_completion(request))
+        elif GEMINI_PATH.match(path):
+            self._send_json({
+                "candidates": [{
+                    "content": {"parts": [{"text": STUB_GEMINI_TEXT}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }]
+            })
+        else:
+            self._send_json({"error": {"message": f"Unknown stub path: {path}"}}, status=404)
+
+    def _openai_completion(self, request):
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": STUB_COMPLETION},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _send_openai_stream(self, request):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for token in re.findall(r'\S+\s*', STUB_COMPLETION):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenAI and Gemini APIs.
+
+    Point OPENAI_BASE_URL at `openai_base_url` and GEMINI_BASE_URL at `base_url`;
+    every response is delayed by `latency_ms` to mimic provider round trips.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_ms=0):
+        super().__init__(('127.0.0.1', port), StubLLMHandler)
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def openai_base_url(self):
+        return f"{self.base_url}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='stub-llm', daemon=True).start()
+        return self
@@ -6,15 +6,122 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def engine_options(database_uri, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping, statement_timeout_ms):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    MySQL and PostgreSQL get a sized, pre-pinged and recycled connection pool and
+    a per-session statement timeout (MySQL's MAX_EXECUTION_TIME only applies to
+    SELECTs). SQLite keeps Flask-SQLAlchemy's defaults, since its pools are not sized.
+    """
+    dialect = (database_uri or '').split(':', 1)[0].split('+', 1)[0]
+    if dialect not in ('mysql', 'mariadb', 'postgresql'):
+        return {}
+
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': pre_ping,
+    }
+    if statement_timeout_ms > 0:
+        if dialect == 'postgresql':
+            options['connect_args'] = {'options': f"-c statement_timeout={statement_timeout_ms}"}
+        else:
+            options['connect_args'] = {'init_command': f"SET SESSION MAX_EXECUTION_TIME={statement_timeout_ms}"}
+    return options
+
+
 class Config:
     # SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
-    SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_DATABASE_URI")
+    SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS", "false").lower() == "true"
+    # Connection pool per process; connections idle longer than the recycle time are replaced
+    # before MySQL's wait_timeout (or a proxy) drops them, and pre-ping catches the rest
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT_SECONDS = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", 10))
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Server-side statement timeout in milliseconds (0 disables it)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT_SECONDS,
+        DB_POOL_RECYCLE_SECONDS, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS
+    )
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_TOKEN_LOCATION = os.getenv("JWT_TOKEN_LOCATION")
     JWT_HEADER_NAME = os.getenv("JWT_HEADER_NAME")
     JWT_HEADER_TYPE = os.getenv("JWT_HEADER_TYPE")
     JWT_ACCESS_TOKEN_EXPIRES = os.getenv("JWT_ACCESS_TOKEN_EXPIRES")
     RYAN_API_KEY = os.getenv("RYAN_API_KEY")
-    GREGORY_GEMINI_API_KEY = os.getenv("GREGORY_GEMINI_API_KEY")
\ No newline at end of file
+    GREGORY_GEMINI_API_KEY = os.getenv("GREGORY_GEMINI_API_KEY")
+    # Comma separated blueprint names served by this instance, or "all"
+    ENABLED_BLUEPRINTS = os.getenv("ENABLED_BLUEPRINTS", "all")
+    # Comma separated model names to load at startup, "all" or "none" (load on first use)
+    WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "none")
+    # Micro-batching of concurrent YOLO requests into one forward pass
+    INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "true").lower() == "true"
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 8))
+    INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 10))
+    # Image prediction cache (in-process LRU, plus an on-disk tier when a directory is set)
+    PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 1024))
+    PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR")
+    PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    # Optional persistence of /foodmodel/identify-food images under uploads/
+    FOOD_SAVE_UPLOADS = os.getenv("FOOD_SAVE_UPLOADS", "true").lower() == "true"
+    FOOD_SAVE_ANNOTATED = os.getenv("FOOD_SAVE_ANNOTATED", "false").lower() == "true"
+    # Threads running the food classifier next to YOLO, and threads writing uploaded images
+    FOOD_CLASSIFIER_WORKERS = int(os.getenv("FOOD_CLASSIFIER_WORKERS", 4))
+    FOOD_UPLOAD_WORKERS = int(os.getenv("FOOD_UPLOAD_WORKERS", 2))
+    # Most records accepted by one */batch save request
+    INGEST_BATCH_MAX_RECORDS = int(os.getenv("INGEST_BATCH_MAX_RECORDS", 500))
+    # Limits for /dpmodel/predictBatch
+    DP_BATCH_MAX_RECORDS = int(os.getenv("DP_BATCH_MAX_RECORDS", 10000))
+    DP_PREDICT_BATCH_SIZE = int(os.getenv("DP_PREDICT_BATCH_SIZE", 1024))
+    # Where skin analysis images are stored ("local" content-addressed store under IMAGE_STORE_DIR)
+    IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "local")
+    IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR")
+    # Set to "true" on worker processes so only one process (or `flask bootstrap-db`) touches the schema
+    SKIP_DB_BOOTSTRAP = os.getenv("SKIP_DB_BOOTSTRAP", "false").lower() == "true"
+    # Shared LLM gateway (see services/llm_gateway.py); the base URLs are only set to use a stub server
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+    LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", 8))
+    LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 5))
+    LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", 20))
+    # Cache for GPT ingredient enhancements, keyed on food name and detected ingredients
+    ENHANCEMENT_CACHE_ENABLED = os.getenv("ENHANCEMENT_CACHE_ENABLED", "true").lower() == "true"
+    ENHANCEMENT_CACHE_SIZE = int(os.getenv("ENHANCEMENT_CACHE_SIZE", 512))
+    ENHANCEMENT_CACHE_TTL_SECONDS = int(os.getenv("ENHANCEMENT_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    ENHANCEMENT_CACHE_DIR = os.getenv("ENHANCEMENT_CACHE_DIR")
+    ENHANCEMENT_CACHE_MAX_BYTES = int(os.getenv("ENHANCEMENT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # Background jobs for ?async=1 requests, queued in a local SQLite file (JOB_WORKERS=0 leaves them to `flask run-jobs`)
+    JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1))
+    JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", 24 * 3600))
+    JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", 600))
+    JOB_CLEANUP_INTERVAL_SECONDS = float(os.getenv("JOB_CLEANUP_INTERVAL_SECONDS", 60))
+    # Comma separated host names ?callback_url= may point at; empty disables callbacks
+    JOB_CALLBACK_HOSTS = os.getenv("JOB_CALLBACK_HOSTS", "")
+    # Inference server mode: YOLO models run in this many separate worker processes (0 runs them in-process)
+    INFERENCE_SERVER_WORKERS = int(os.getenv("INFERENCE_SERVER_WORKERS", 0))
+    INFERENCE_SERVER_SLOT_BYTES = int(os.getenv("INFERENCE_SERVER_SLOT_BYTES", 3 * 1920 * 1920))
+    INFERENCE_SERVER_PIN_CPUS = os.getenv("INFERENCE_SERVER_PIN_CPUS", "false").lower() == "true"
+    INFERENCE_SERVER_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_SERVER_TIMEOUT_SECONDS", 60))
+    # Request/stage latency histograms served at /metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Logging: root level, per-module overrides ("routes.foodmodel=DEBUG,werkzeug=WARNING"),
+    # "json" or "text" output, and the fraction of DEBUG records kept
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 0.1))
@@ -0,0 +1,89 @@
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from extensions import db
+from models.daily_nutrition import DailyNutrition
+from models.foodscan import NUTRIENT_KEYS, FoodScan
+from models.ingredient import populate_ingredients
+from models.schema_version import SchemaVersion
+from services.nutrition_rollup import rebuild_rollups
+
+# Bump this whenever the models change in a way that needs create_all() or new seed data
+SCHEMA_VERSION = 2
+
+
+def get_schema_version():
+    """Returns the schema version recorded in the database, or None if it was never bootstrapped."""
+    try:
+        row = db.session.get(SchemaVersion, 1)
+        return row.version if row else None
+    except (OperationalError, ProgrammingError):
+        # The version table does not exist yet
+        db.session.rollback()
+        return None
+
+
+@contextmanager
+def bootstrap_lock():
+    """
+    Serializes bootstrap across processes on MySQL so concurrent boots don't race.
+
+    MySQL named locks belong to a connection, so the lock is taken and released
+    on one dedicated connection rather than the session's, which goes back to
+    the pool on every commit.
+    """
+    if db.engine.dialect.name != 'mysql':
+        yield
+        return
+    with db.engine.connect() as connection:
+        acquired = connection.execute(text("SELECT GET_LOCK('app_bootstrap', 60)")).scalar()
+        if acquired != 1:
+            raise RuntimeError("Timed out waiting for the database bootstrap lock")
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK('app_bootstrap')"))
+
+
+def bootstrap_database(force=False):
+    """
+    Creates missing tables and seeds reference data, once per schema version.
+
+    A normal start only reads the single version row; the schema is created and
+    the ingredients upserted only when the recorded version is older than
+    SCHEMA_VERSION (or `force` is set).
+    """
+    if not force and get_schema_version() == SCHEMA_VERSION:
+        logging.info(f"Database schema is at version {SCHEMA_VERSION}, skipping bootstrap.")
+        return False
+
+    with bootstrap_lock():
+        # Another process may have finished the bootstrap while we waited for the lock
+        if not force and get_schema_version() == SCHEMA_VERSION:
+            return False
+
+        logging.info(f"Bootstrapping database schema to version {SCHEMA_VERSION}...")
+        inspector = inspect(db.engine)
+        creates_rollups = not inspector.has_table(DailyNutrition.__tablename__)
+        # Scans from before the total columns existed are summed by the migration that adds them
+        scans_have_totals = not inspector.has_table(FoodScan.__tablename__) or set(NUTRIENT_KEYS) <= {
+            column['name'] for column in inspector.get_columns(FoodScan.__tablename__)
+        }
+        db.create_all()
+        populate_ingredients()
+        if creates_rollups and scans_have_totals:
+            # The table is new, so fill it from the scans already stored
+            rebuild_rollups()
+
+        row = db.session.get(SchemaVersion, 1)
+        if row is None:
+            db.session.add(SchemaVersion(id=1, version=SCHEMA_VERSION))
+        else:
+            row.version = SCHEMA_VERSION
+        db.session.commit()
+
+    logging.info("Database bootstrap complete.")
+    return True
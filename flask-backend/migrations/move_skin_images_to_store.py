@@ -0,0 +1,53 @@
+from extensions import db
+from models.skin_analysis import SkinAnalysis
+from services.image_store import store_image_value
+from sqlalchemy.orm import load_only
+
+
+def move_skin_images_to_store(batch_size=50):
+    """
+    One-shot migration that moves inline data URL images out of skin_analyses.
+
+    Rows are processed in id order, `batch_size` at a time, so only one batch of
+    images is held in memory. Rows that already hold a key or a regular URL are
+    left untouched, so the migration can be re-run safely.
+    """
+    moved = 0
+    last_id = 0
+    while True:
+        analyses = (SkinAnalysis.query
+                    .options(load_only(SkinAnalysis.id, SkinAnalysis.image_url, SkinAnalysis.annotated_image_url))
+                    .filter(SkinAnalysis.id > last_id)
+                    .order_by(SkinAnalysis.id)
+                    .limit(batch_size)
+                    .all())
+        if not analyses:
+            break
+
+        try:
+            for analysis in analyses:
+                image_url = store_image_value(analysis.image_url)
+                annotated_image_url = store_image_value(analysis.annotated_image_url)
+                if image_url != analysis.image_url or annotated_image_url != analysis.annotated_image_url:
+                    analysis.image_url = image_url
+                    analysis.annotated_image_url = annotated_image_url
+                    moved += 1
+            db.session.commit()
+        except Exception as e:
+            print(f"Error moving skin analysis images: {e}")
+            db.session.rollback()
+            raise
+
+        last_id = analyses[-1].id
+        db.session.expunge_all()
+
+    print(f"Moved images of {moved} skin analyses to the image store")
+    return moved
+
+
+# Run from flask-backend/ with: python -m migrations.move_skin_images_to_store
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        move_skin_images_to_store()
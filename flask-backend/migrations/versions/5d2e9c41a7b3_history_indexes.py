@@ -0,0 +1,91 @@
+"""Per-user history indexes, skin_analyses table and name lookup indexes
+
+Revision ID: 5d2e9c41a7b3
+Revises: 8ab8c0b283c5
+Create Date: 2026-10-18 21:05:12.418305
+
+Replaces the ad-hoc migrations/create_skin_analyses.py and
+migrations/add_annotated_image.py scripts. Most existing databases were built
+with create_all() rather than Alembic, so every step checks the live schema
+first and the revision can be applied to any of them.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e9c41a7b3'
+down_revision = '8ab8c0b283c5'
+branch_labels = None
+depends_on = None
+
+# (index name, table, timestamp column) for the history listings: WHERE user_id = ? ORDER BY <ts> DESC
+HISTORY_INDEXES = [
+    ('ix_oral_analysis_history_user_id_analysis_date', 'oral_analysis_history', 'analysis_date'),
+    ('ix_skin_analyses_user_id_timestamp', 'skin_analyses', 'timestamp'),
+    ('ix_health_predictions_user_id_created_at', 'health_predictions', 'created_at'),
+    ('ix_food_scans_user_id_timestamp', 'food_scans', 'timestamp'),
+]
+
+
+def _index_names(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def _is_indexed(inspector, table, columns):
+    """True if some index or unique constraint on `table` covers exactly `columns`."""
+    keys = inspector.get_indexes(table) + inspector.get_unique_constraints(table)
+    return any(key['column_names'] == columns for key in keys)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'skin_analyses' not in tables and 'users' in tables:
+        op.create_table('skin_analyses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('image_url', sa.Text(), nullable=True),
+        sa.Column('annotated_image_url', sa.Text(), nullable=True),
+        sa.Column('predictions', sa.JSON(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        tables.add('skin_analyses')
+    elif 'skin_analyses' in tables:
+        columns = {column['name'] for column in inspector.get_columns('skin_analyses')}
+        if 'annotated_image_url' not in columns:
+            op.add_column('skin_analyses', sa.Column('annotated_image_url', sa.Text(), nullable=True))
+
+    for name, table, timestamp_column in HISTORY_INDEXES:
+        # Tables that do not exist yet get the index from the model when they are created
+        if table in tables and name not in _index_names(inspector, table):
+            op.create_index(name, table, ['user_id', sa.column(timestamp_column).desc()], unique=False)
+
+    if 'ingredients' in tables and not _is_indexed(inspector, 'ingredients', ['name']):
+        # Older boots re-inserted the seed rows; keep the oldest row per name so the unique index can be built
+        op.execute(
+            "DELETE FROM ingredients WHERE id NOT IN "
+            "(SELECT id FROM (SELECT MIN(id) AS id FROM ingredients GROUP BY name) AS keep)"
+        )
+        op.create_index('ix_ingredients_name', 'ingredients', ['name'], unique=True)
+
+    if 'dishes' in tables and not _is_indexed(inspector, 'dishes', ['name']):
+        op.create_index('ix_dishes_name', 'dishes', ['name'], unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    # skin_analyses and its annotated_image_url column predate this revision
+    # (they came from the ad-hoc scripts), so only the indexes are removed.
+    indexes = [(name, table) for name, table, _ in HISTORY_INDEXES]
+    indexes += [('ix_ingredients_name', 'ingredients'), ('ix_dishes_name', 'dishes')]
+    for name, table in indexes:
+        if table in tables and name in _index_names(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,98 @@
+"""Native JSON food scan ingredients with per-scan nutrition totals
+
+Revision ID: 9b4f6e2a1c85
+Revises: 5d2e9c41a7b3
+Create Date: 2026-10-18 22:14:37.902116
+
+Adds total_calories/total_carb/total_protein/total_fat to food_scans, fills
+them in from the stored ingredient JSON, and converts ingredients from TEXT
+to a native JSON column. Values that are not valid JSON are kept as a JSON
+string (with zero totals) so the conversion cannot fail on them.
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from models.foodscan import NUTRIENT_KEYS, nutrition_totals, parse_ingredients
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f6e2a1c85'
+down_revision = '5d2e9c41a7b3'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def _as_json(raw):
+    """Keeps a value that is already valid JSON (a re-run), otherwise wraps the raw text in a JSON string."""
+    try:
+        json.loads(raw)
+        return raw
+    except (TypeError, ValueError):
+        return json.dumps(raw)
+
+
+def backfill_totals(bind):
+    """Recomputes the totals of every scan, BACKFILL_BATCH_SIZE rows at a time in id order."""
+    update = sa.text(
+        "UPDATE food_scans SET ingredients = :ingredients, "
+        + ", ".join(f"{column} = :{column}" for column in NUTRIENT_KEYS)
+        + " WHERE id = :id"
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text("SELECT id, ingredients FROM food_scans WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row_id, raw in rows:
+            try:
+                ingredients = parse_ingredients(raw)
+                updates.append({'id': row_id, 'ingredients': json.dumps(ingredients), **nutrition_totals(ingredients)})
+            except ValueError:
+                updates.append({'id': row_id, 'ingredients': _as_json(raw), **nutrition_totals([])})
+        bind.execute(update, updates)
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'food_scans' not in inspector.get_table_names():
+        # Created with the new columns by the schema bootstrap
+        return
+
+    columns = {column['name'] for column in inspector.get_columns('food_scans')}
+    for column in NUTRIENT_KEYS:
+        if column not in columns:
+            op.add_column('food_scans', sa.Column(column, sa.Float(), nullable=False, server_default='0'))
+
+    backfill_totals(bind)
+
+    # SQLite stores JSON as text already
+    if bind.dialect.name == 'postgresql':
+        op.alter_column('food_scans', 'ingredients', existing_type=sa.Text(), type_=sa.JSON(),
+                        existing_nullable=False, postgresql_using='ingredients::json')
+    elif bind.dialect.name != 'sqlite':
+        op.alter_column('food_scans', 'ingredients', existing_type=sa.Text(), type_=sa.JSON(),
+                        existing_nullable=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if 'food_scans' not in sa.inspect(bind).get_table_names():
+        return
+
+    if bind.dialect.name != 'sqlite':
+        op.alter_column('food_scans', 'ingredients', existing_type=sa.JSON(), type_=sa.Text(),
+                        existing_nullable=False)
+    with op.batch_alter_table('food_scans') as batch_op:
+        for column in NUTRIENT_KEYS:
+            batch_op.drop_column(column)
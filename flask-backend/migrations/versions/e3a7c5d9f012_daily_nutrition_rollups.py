@@ -0,0 +1,54 @@
+"""Per-user daily nutrition rollups
+
+Revision ID: e3a7c5d9f012
+Revises: 9b4f6e2a1c85
+Create Date: 2026-10-18 23:02:51.660473
+
+Creates daily_nutrition and fills it from the existing food scans. From then
+on the food scan endpoints keep it up to date; `flask rebuild-nutrition-rollups`
+recomputes it if it ever drifts.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c5d9f012'
+down_revision = '9b4f6e2a1c85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    if 'daily_nutrition' not in tables:
+        op.create_table('daily_nutrition',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('scans', sa.Integer(), nullable=False),
+        sa.Column('total_calories', sa.Float(), nullable=False),
+        sa.Column('total_carb', sa.Float(), nullable=False),
+        sa.Column('total_protein', sa.Float(), nullable=False),
+        sa.Column('total_fat', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', name='uq_daily_nutrition_user_id_day')
+        )
+
+    # The schema bootstrap may already have created the table, empty; fill it either way
+    empty = bind.execute(sa.text("SELECT COUNT(*) FROM daily_nutrition")).scalar() == 0
+    if 'food_scans' in tables and empty:
+        op.execute(
+            "INSERT INTO daily_nutrition "
+            "(user_id, day, scans, total_calories, total_carb, total_protein, total_fat) "
+            "SELECT user_id, DATE(timestamp), COUNT(id), SUM(total_calories), SUM(total_carb), "
+            "SUM(total_protein), SUM(total_fat) "
+            "FROM food_scans GROUP BY user_id, DATE(timestamp)"
+        )
+
+
+def downgrade():
+    op.drop_table('daily_nutrition')
@@ -4,6 +4,9 @@ from datetime import datetime
 # Define the HealthPrediction model
 class HealthPrediction(db.Model):
     __tablename__ = 'health_predictions'
+    __table_args__ = (
+        db.Index('ix_health_predictions_user_id_created_at', 'user_id', db.desc('created_at')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -1,4 +1,9 @@
 from .user import User
 from .dish import Dish
 from .ingredient import Ingredient
-from .foodscan import FoodScan
\ No newline at end of file
+from .foodscan import FoodScan
+from .daily_nutrition import DailyNutrition
+from .HealthPrediction import HealthPrediction
+from .oral_analysis_history import OralAnalysisHistory
+from .skin_analysis import SkinAnalysis
+from .schema_version import SchemaVersion
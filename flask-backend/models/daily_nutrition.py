@@ -0,0 +1,20 @@
+from extensions import db
+
+# Per-user per-day nutrition totals, kept in step with food_scans by services/nutrition_rollup.py
+class DailyNutrition(db.Model):
+    __tablename__ = 'daily_nutrition'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_daily_nutrition_user_id_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC date of the scans
+    scans = db.Column(db.Integer, nullable=False, default=0)
+    total_calories = db.Column(db.Float, nullable=False, default=0)
+    total_carb = db.Column(db.Float, nullable=False, default=0)
+    total_protein = db.Column(db.Float, nullable=False, default=0)
+    total_fat = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyNutrition user={self.user_id} day={self.day} scans={self.scans}>"
@@ -1,19 +1,75 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy.orm import validates
+import json
+
+# Nutrient total column -> keys an ingredient may carry it under (GPT sometimes spells them out)
+NUTRIENT_KEYS = {
+    "total_calories": ("calories",),
+    "total_carb": ("carb", "carbohydrates"),
+    "total_protein": ("protein",),
+    "total_fat": ("fat", "fats"),
+}
+
+
+def parse_ingredients(value):
+    """Returns the ingredient list from a list or its JSON string; raises ValueError otherwise."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError("ingredients must be a JSON list")
+    return value
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def nutrition_totals(ingredients):
+    """Sums each nutrient over the ingredients, scaled by the ingredient's quantity (1 when missing)."""
+    totals = dict.fromkeys(NUTRIENT_KEYS, 0.0)
+    for ingredient in ingredients:
+        if not isinstance(ingredient, dict):
+            continue
+        quantity = _number(ingredient.get("quantity", 1))
+        for column, keys in NUTRIENT_KEYS.items():
+            value = next((ingredient[key] for key in keys if key in ingredient), 0)
+            totals[column] += _number(value) * quantity
+    return {column: round(total, 2) for column, total in totals.items()}
+
 
 # FoodScan model
 class FoodScan(db.Model):
     __tablename__ = "food_scans"
+    __table_args__ = (
+        db.Index("ix_food_scans_user_id_timestamp", "user_id", db.desc("timestamp")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     food_name = db.Column(db.String(255), nullable=False)
     food_image = db.Column(db.String(500), nullable=False)  # URL or base64
-    ingredients = db.Column(db.Text, nullable=False)  # Store as JSON string
+    ingredients = db.Column(db.JSON, nullable=False)  # List of ingredients with their nutritional data
+    # Per-scan totals derived from the ingredients, so summaries can be aggregated in SQL
+    total_calories = db.Column(db.Float, nullable=False, default=0)
+    total_carb = db.Column(db.Float, nullable=False, default=0)
+    total_protein = db.Column(db.Float, nullable=False, default=0)
+    total_fat = db.Column(db.Float, nullable=False, default=0)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     # Relationship with User model
     user = db.relationship("User", backref=db.backref("food_scans", lazy=True))
 
+    @validates("ingredients")
+    def validate_ingredients(self, key, value):
+        # Accepts the JSON string older clients send and keeps the totals in step
+        ingredients = parse_ingredients(value)
+        for column, total in nutrition_totals(ingredients).items():
+            setattr(self, column, total)
+        return ingredients
+
     def __repr__(self):
-        return f"<FoodScan {self.food_name}, User {self.user_id}, Date {self.timestamp}>"
\ No newline at end of file
+        return f"<FoodScan {self.food_name}, User {self.user_id}, Date {self.timestamp}>"
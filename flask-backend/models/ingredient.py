@@ -1,11 +1,15 @@
+import logging
+
 from extensions import db
 
+logger = logging.getLogger(__name__)
+
 # Ingredient model
 class Ingredient(db.Model):
     __tablename__ = 'ingredients'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(80), nullable=False)
+    name = db.Column(db.String(80), nullable=False, unique=True, index=True)
     calories = db.Column(db.Float, nullable=False)
     carb = db.Column(db.Float, nullable=False)
     protein = db.Column(db.Float, nullable=False)
@@ -15,34 +19,48 @@ class Ingredient(db.Model):
     def __repr__(self):
         return f"<Ingredient {self.name}>"
     
+# Seed ingredients, keyed on name
+INGREDIENTS_DATA = [
+    {"name": "egg", "calories": 155, "carb": 1.1, "protein": 13, "fat": 11, "increment_type": "piece"},
+    {"name": "sambal", "calories": 150, "carb": 15, "protein": 2, "fat": 10, "increment_type": "tablespoon"},
+    {"name": "rice", "calories": 130, "carb": 28, "protein": 2.7, "fat": 0.3, "increment_type": "grams"},
+    {"name": "chicken", "calories": 165, "carb": 0, "protein": 31, "fat": 3.6, "increment_type": "grams"},
+    {"name": "peanuts", "calories": 567, "carb": 16, "protein": 25, "fat": 49, "increment_type": "grams"},
+    {"name": "cucumber", "calories": 15, "carb": 3.6, "protein": 0.7, "fat": 0.1, "increment_type": "grams"},
+    {"name": "anchovies", "calories": 210, "carb": 0, "protein": 20, "fat": 15, "increment_type": "grams"},
+]
+
 def populate_ingredients():
-    # Define the ingredients data
-    ingredients_data = [
-        {"name": "egg", "calories": 155, "carb": 1.1, "protein": 13, "fat": 11, "increment_type": "piece"},
-        {"name": "sambal", "calories": 150, "carb": 15, "protein": 2, "fat": 10, "increment_type": "tablespoon"},
-        {"name": "rice", "calories": 130, "carb": 28, "protein": 2.7, "fat": 0.3, "increment_type": "grams"},
-        {"name": "chicken", "calories": 165, "carb": 0, "protein": 31, "fat": 3.6, "increment_type": "grams"},
-        {"name": "peanuts", "calories": 567, "carb": 16, "protein": 25, "fat": 49, "increment_type": "grams"},
-        {"name": "cucumber", "calories": 15, "carb": 3.6, "protein": 0.7, "fat": 0.1, "increment_type": "grams"},
-        {"name": "anchovies", "calories": 210, "carb": 0, "protein": 20, "fat": 15, "increment_type": "grams"},
-    ]
-
-    # Loop through each ingredient and add it to the database
-    for ingredient in ingredients_data:
-        new_ingredient = Ingredient(
-            name=ingredient["name"],
-            calories=ingredient["calories"],
-            carb=ingredient["carb"],
-            protein=ingredient["protein"],
-            fat=ingredient["fat"],
-            increment_type=ingredient["increment_type"]
-        )
-        db.session.add(new_ingredient)
-
-    # Commit the changes to the database
+    """
+    Upserts the seed ingredients by name, so running it again never adds rows.
+
+    Older versions inserted the seed rows on every start, so duplicates of a seed
+    name are removed here as well (keeping the oldest row).
+    """
+    names = [ingredient["name"] for ingredient in INGREDIENTS_DATA]
     try:
+        existing = {}
+        for ingredient in Ingredient.query.filter(Ingredient.name.in_(names)).order_by(Ingredient.id).all():
+            if ingredient.name in existing:
+                db.session.delete(ingredient)
+            else:
+                existing[ingredient.name] = ingredient
+        # Remove duplicates before inserting so the unique index on name is never violated
+        db.session.flush()
+
+        for data in INGREDIENTS_DATA:
+            ingredient = existing.get(data["name"])
+            if ingredient is None:
+                db.session.add(Ingredient(**data))
+            else:
+                for field, value in data.items():
+                    setattr(ingredient, field, value)
+
+        # Commit the changes to the database
         db.session.commit()
-        print("Ingredients successfully added to the database.")
+        logger.info("Ingredients successfully seeded.")
     except Exception as e:
         db.session.rollback()
-        print(f"Error adding ingredients: {e}")
\ No newline at end of file
+        logger.error("Error seeding ingredients: %s", e)
+        # Let the bootstrap fail so the schema version is not recorded and the seed is retried
+        raise
@@ -3,6 +3,10 @@ import datetime
 
 class OralAnalysisHistory(db.Model):
     __tablename__ = 'oral_analysis_history'
+    __table_args__ = (
+        # History pages list one user's analyses, newest first
+        db.Index('ix_oral_analysis_history_user_id_analysis_date', 'user_id', db.desc('analysis_date')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Link to the User model
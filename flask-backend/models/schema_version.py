@@ -0,0 +1,13 @@
+from extensions import db
+from datetime import datetime
+
+# Single-row table recording which schema version the bootstrap last applied
+class SchemaVersion(db.Model):
+    __tablename__ = 'app_schema_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaVersion {self.version}>"
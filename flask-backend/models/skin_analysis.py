@@ -4,6 +4,9 @@ import json
 
 class SkinAnalysis(db.Model):
     __tablename__ = 'skin_analyses'
+    __table_args__ = (
+        db.Index('ix_skin_analyses_user_id_timestamp', 'user_id', db.desc('timestamp')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1,6 +1,7 @@
+import logging
 from flask import Blueprint, request, jsonify, current_app, session
-from ultralytics import YOLO
 from io import BytesIO
+from datetime import datetime
 from PIL import Image
 import os
 import base64
@@ -8,36 +9,47 @@ from models.skin_analysis import SkinAnalysis
 from extensions import db
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-import google.generativeai as google_gen_ai
+from services.llm_gateway import LLMBusyError, get_llm_gateway
+from services.streaming import sse_response
 from flask_cors import CORS
+from services.inference_scheduler import detect
+from services.cache import get_prediction_cache, image_cache_key
+from services.image_store import store_image_value, stored_image_url
+from services.batch_ingest import BatchError, batch_response, ingest_batch, parse_timestamp, read_batch, require
+from services.pagination import PaginationError, paginate_records, stream_records, wants_stream
+from services.job_queue import enqueue_job, job_handler, wants_async
+from services.metrics import timed
 
 acnemodel_bp = Blueprint('acnemodel', __name__)
+logger = logging.getLogger(__name__)
 CORS(acnemodel_bp, resources={r"/*": {"origins": "*"}})
 
+# Fields returned by the history endpoint (same as SkinAnalysis.to_dict): output name -> (model attribute, formatter)
+HISTORY_FIELDS = {
+    'id': ('id', None),
+    'user_id': ('user_id', None),
+    'image_url': ('image_url', stored_image_url),
+    'predictions': ('predictions', None),
+    'notes': ('notes', None),
+    'timestamp': ('timestamp', lambda value: value.isoformat())
+}
 
-# Load YOLOv8 model
-model_path = os.path.join(os.getcwd(), 'aimodels/acne/best.pt')
-model = YOLO(model_path)
 
 # Generative AI Google Gemini model
-# Initialize Google Gemini AI API
-def get_gen_ai_model():
+# Initialize Google Gemini AI API (the model and its client are shared through the LLM gateway)
+def get_gen_ai_api_key():
     api_key = current_app.config.get("RYAN_API_KEY")  # Use .get() to avoid errors if key is missing
     if not api_key:
         raise ValueError("API key for Google Gemini AI is missing")
-    
-    google_gen_ai.configure(api_key=api_key)
-    return google_gen_ai.GenerativeModel("gemini-pro")
+    return api_key
 
 
 @acnemodel_bp.route('/predict', methods=['POST'])
 def predict():
     try:
-        print("Request received")
-        print("Request headers:", dict(request.headers))
-        print("Request files:", request.files)
-        print("Request form:", request.form)
-        
+        # Headers are not logged; they carry the Authorization token
+        logger.debug("Predict request: files=%s form=%s", request.files, request.form)
+
         if 'file' not in request.files:
             return jsonify({'error': 'No file part in the request'}), 422
         
@@ -56,36 +68,58 @@ def predict():
         if not img_bytes:
             return jsonify({'error': 'Empty file'}), 422
 
-        # Convert bytes to image
-        img = Image.open(BytesIO(img_bytes))
-        
-        # Run model prediction
-        results = model(img)
-        
-        # Process predictions
-        predictions = []
-        for result in results:
-            for box in result.boxes:
-                box_values = box.xywh[0].cpu().numpy()
-                prediction = {
-                    'class': int(box.cls.cpu().item()),
-                    'confidence': float(box.conf.cpu().item()),
-                    'x_center': float(box_values[0]),
-                    'y_center': float(box_values[1]),
-                    'width': float(box_values[2]),
-                    'height': float(box_values[3]),
-                }
-                predictions.append(prediction)
-        
-        print("Predictions generated:", predictions)
+        # With ?async=1 the prediction runs on the job workers and the client polls /jobs/<id>
+        if wants_async():
+            return enqueue_job('acne_predict', data=img_bytes)
+
+        with timed('decode'):
+            img = Image.open(BytesIO(img_bytes))
+            img.load()
+        predictions = predict_acne(img)
+        logger.debug("Predictions generated: %s", predictions)
         return jsonify({'predictions': predictions})
 
     except Exception as e:
-        import traceback
-        print("Error in prediction:")
-        print(traceback.format_exc())
+        logger.exception("Error in prediction")
         return jsonify({'error': str(e)}), 500
 
+
+def predict_acne(img):
+    """Returns the acne detections for a PIL image, using the prediction cache when enabled."""
+    # Return the stored predictions if this exact image was analysed before
+    cache = get_prediction_cache()
+    cache_key = image_cache_key(img, 'acne') if cache else None
+    if cache:
+        cached_predictions = cache.get(cache_key)
+        if cached_predictions is not None:
+            return cached_predictions
+
+    # Run model prediction (batched with other concurrent requests)
+    detections = detect('acne', img)
+
+    # Process predictions
+    predictions = []
+    for box_values, confidence, class_id in zip(detections.xywh, detections.conf, detections.cls):
+        prediction = {
+            'class': int(class_id),
+            'confidence': float(confidence),
+            'x_center': float(box_values[0]),
+            'y_center': float(box_values[1]),
+            'width': float(box_values[2]),
+            'height': float(box_values[3]),
+        }
+        predictions.append(prediction)
+
+    if cache:
+        cache.set(cache_key, predictions)
+    return predictions
+
+
+@job_handler('acne_predict')
+def acne_predict_job(payload, img_bytes):
+    return {'predictions': predict_acne(Image.open(BytesIO(img_bytes)))}
+
+
 @acnemodel_bp.route('/skin-analysis/save', methods=['POST'])
 @jwt_required()
 def save_analysis():
@@ -96,7 +130,7 @@ def save_analysis():
         # Create new analysis
         analysis = SkinAnalysis(
             user_id=user_id,
-            image_url=data['imageUrl'],
+            image_url=store_image_value(data['imageUrl']),
             predictions=data['predictions'],
             notes=data.get('notes', ''),
             timestamp=data.get('timestamp')
@@ -111,14 +145,48 @@ def save_analysis():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@acnemodel_bp.route('/skin-analysis/save/batch', methods=['POST'])
+@jwt_required()
+def save_analysis_batch():
+    """Saves many analyses for the signed-in user in one transaction; see services/batch_ingest.py."""
+    user_id = int(get_jwt_identity())
+
+    def build_row(record):
+        require(record, 'imageUrl', 'predictions')
+        return {
+            'user_id': user_id,
+            'image_url': store_image_value(record['imageUrl']),
+            'predictions': record['predictions'],
+            'notes': record.get('notes', ''),
+            # Every row needs the same columns, so the default is filled in here rather than by the table
+            'timestamp': parse_timestamp(record.get('timestamp')) or datetime.utcnow()
+        }
+
+    try:
+        results, saved = ingest_batch(SkinAnalysis, read_batch(), build_row)
+        return batch_response(results, saved)
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        logger.error("Error saving analysis batch: %s", e)
+        return jsonify({'error': str(e)}), 500
+
 @acnemodel_bp.route('/skin-analysis/history', methods=['GET'])
 @jwt_required()
 def get_history():
     try:
         user_id = get_jwt_identity()
-        analyses = SkinAnalysis.query.filter_by(user_id=user_id).order_by(SkinAnalysis.timestamp.desc()).all()
-        return jsonify([analysis.to_dict() for analysis in analyses])
+        query = SkinAnalysis.query.filter_by(user_id=user_id)
+        if wants_stream():
+            return stream_records(query, SkinAnalysis, 'timestamp', HISTORY_FIELDS)
+
+        page = paginate_records(query, SkinAnalysis, 'timestamp', HISTORY_FIELDS)
+        if page.paginated:
+            return jsonify({'items': page.items, 'next_cursor': page.next_cursor})
+        return jsonify(page.items)
     
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -161,6 +229,16 @@ def delete_analysis(analysis_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
     
+def build_chat_prompt(data):
+    message = data.get("message", "").strip()
+    instruction = data.get("instruction", "").strip()
+    context = data.get("context", "").strip()
+
+    # Build the prompt
+    if instruction and context:
+        return f"{instruction}\n{context}\n\nUser: {message}"
+    return f"User: {message}"
+
 # chat with context
 @acnemodel_bp.route('/chat', methods=['POST'])
 def chat():
@@ -168,24 +246,32 @@ def chat():
         data = request.get_json()
         if not data:
             return jsonify({"error": "Request body is empty"}), 400
-        
-        message = data.get("message", "").strip()
-        instruction = data.get("instruction", "").strip()
-        context = data.get("context", "").strip()
-
-        model = get_gen_ai_model()
 
-        # Build the prompt
-        if instruction and context:
-            chat_history = f"{instruction}\n{context}\n\nUser: {message}"
-        else:
-            chat_history = f"User: {message}"
+        api_key = get_gen_ai_api_key()
+        chat_history = build_chat_prompt(data)
 
         # Generate AI response
-        response = model.generate_content(chat_history)
+        response = get_llm_gateway().gemini_generate(api_key, chat_history)
 
         return jsonify({"response": response.text})
 
+    except LLMBusyError as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error("Error in chat endpoint: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+# chat with context, streamed as server-sent events
+@acnemodel_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Request body is empty"}), 400
+
+        api_key = get_gen_ai_api_key()
+        return sse_response(get_llm_gateway().stream_gemini_generate(api_key, build_chat_prompt(data)))
+
     except Exception as e:
-        print(f"Error in chat endpoint: {str(e)}")  # Add logging
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        logger.error("Error in chat stream endpoint: %s", e)
+        return jsonify({"error": str(e)}), 500
@@ -1,16 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from extensions import db
+from sqlalchemy import insert
 from models.HealthPrediction import HealthPrediction
 from datetime import datetime
-import tensorflow as tf
 import numpy as np
 import os
 import pandas as pd
 import logging
 from flask_cors import cross_origin
+from services.model_registry import model_registry
+from services.pagination import PaginationError, paginate_records, stream_records, wants_stream
+from services.job_queue import enqueue_job, job_handler, wants_async
+from services.metrics import timed
+from services.batch_ingest import known_user_ids
 
 # Create Blueprint
 dpmodel_bp = Blueprint('dpmodel', __name__)
+logger = logging.getLogger(__name__)
 
 # # Define the HealthPrediction model
 # class HealthPrediction(db.Model):
@@ -41,15 +47,6 @@ EXPECTED_FEATURES = [
     'smokingCategory', 'diabetes_smoker_interaction', 'stroke_hypertension_interaction'
 ]
 
-# Load the model
-try:
-    model_path = os.path.join(os.getcwd(), 'aimodels/DP/dp_model.h5')
-    dp_model = tf.keras.models.load_model(model_path)
-    print("Model loaded successfully")
-except Exception as e:
-    print(f"Error loading model: {str(e)}")
-    raise RuntimeError("Model failed to load")
-
 def calculate_bmi_category(bmi):
     if bmi < 18.5:
         return 0  # Underweight
@@ -119,132 +116,332 @@ def get_risk_level(risk_percentage):
     else:
         return 'High'
     
+
+# Raw input columns and how they are parsed (ints are truncated like int(float(value)))
+INTEGER_INPUTS = ['user_id', 'gender', 'age', 'currentSmoker', 'BPMeds', 'prevalentStroke', 'prevalentHyp', 'diabetes']
+FLOAT_INPUTS = ['cigsPerDay', 'sysBP', 'diaBP', 'BMI']
+
+
+def build_feature_frame(records):
+    """
+    Parses many input records and computes the derived features with column operations.
+
+    Returns the parsed DataFrame (one row per valid record, indexed by its position
+    in `records`) and a list of per-record errors for rows with non-numeric values.
+    """
+    df = pd.DataFrame.from_records(records, columns=INTEGER_INPUTS + FLOAT_INPUTS)
+    invalid = np.zeros(len(df), dtype=bool)
+
+    for column in INTEGER_INPUTS + FLOAT_INPUTS:
+        raw = df[column]
+        values = pd.to_numeric(raw, errors='coerce')
+        # A value that was provided but is not a number makes the whole record invalid
+        invalid |= (values.isna() & raw.notna()).to_numpy()
+        values = values.fillna(0).astype(float)
+        df[column] = np.trunc(values).astype(int) if column in INTEGER_INPUTS else values
+
+    errors = [{'index': int(index), 'error': 'Non-numeric value in record'} for index in np.flatnonzero(invalid)]
+    df = df[~invalid]
+
+    # Calculate derived features
+    sys_bp = df['sysBP'].to_numpy()
+    dia_bp = df['diaBP'].to_numpy()
+    df['BP_ratio'] = np.divide(sys_bp, dia_bp, out=np.zeros_like(sys_bp), where=dia_bp != 0)
+    df['hypertension'] = ((sys_bp >= 140) | (dia_bp >= 90)).astype(int)
+    df['BMI_category'] = np.digitize(df['BMI'].to_numpy(), [18.5, 25, 30])
+
+    # Features the single-record endpoint does not derive either default to 0
+    for feature in EXPECTED_FEATURES:
+        if feature not in df:
+            df[feature] = 0
+
+    return df, errors
+
+
+def calculate_risk_scores(predictions, df):
+    """Vectorized version of calculate_risk_score for a batch of predictions."""
+    base_risk_scores = predictions[:, 0].astype(float)
+
+    # Age Impact
+    age = df['age'].to_numpy()
+    risk_multipliers = np.where(age < 30, 0.7, np.where(age > 60, 1.3, 1.0))
+
+    # Health Conditions Impact
+    has_condition = (df[['diabetes', 'prevalentStroke', 'prevalentHyp']].to_numpy() != 0).any(axis=1)
+    risk_multipliers *= np.where(has_condition, 1.5, 1.0)
+
+    # Smoking Impact
+    heavy_smoker = (df['currentSmoker'].to_numpy() == 1) & (df['cigsPerDay'].to_numpy() > 10)
+    risk_multipliers *= np.where(heavy_smoker, 1.2, 1.0)
+
+    risk_percentages = np.clip(base_risk_scores * risk_multipliers * 100, 0, 100)
+    risk_levels = np.select(
+        [risk_percentages < 20, risk_percentages < 50, risk_percentages < 80],
+        ['Low Risk', 'Moderate Risk', 'High Risk'],
+        default='Very High Risk'
+    )
+
+    return {
+        'riskPercentage': np.round(risk_percentages, 2),
+        'riskLevel': risk_levels,
+        'confidence': np.round(risk_percentages / 100, 2)
+    }
+
+# Fields returned by the history endpoint: output name -> (model attribute, formatter)
+HISTORY_FIELDS = {
+    'id': ('id', None),
+    'user_id': ('user_id', None),
+    'risk_score': ('risk_score', None),
+    'risk_level': ('risk_level', None),
+    'created_at': ('created_at', lambda value: value.isoformat()),
+    'age': ('age', None),
+    'gender': ('gender', None),
+    'current_smoker': ('current_smoker', None),
+    'cigs_per_day': ('cigs_per_day', None),
+    'bp_meds': ('bp_meds', None),
+    'prevalent_stroke': ('prevalent_stroke', None),
+    'prevalent_hyp': ('prevalent_hyp', None),
+    'diabetes': ('diabetes', None),
+    'sys_bp': ('sys_bp', None),
+    'dia_bp': ('dia_bp', None),
+    'bmi': ('bmi', None)
+}
+
 # Get Prediction History
 @dpmodel_bp.route('/history/<int:user_id>', methods=['GET'])
 def get_prediction_history(user_id):
     try:
-        predictions = HealthPrediction.query.filter_by(user_id=user_id).order_by(HealthPrediction.created_at.desc()).all()
-        if not predictions:
+        query = HealthPrediction.query.filter_by(user_id=user_id)
+        if wants_stream():
+            return stream_records(query, HealthPrediction, 'created_at', HISTORY_FIELDS)
+
+        page = paginate_records(query, HealthPrediction, 'created_at', HISTORY_FIELDS)
+        if not page.items and not request.args.get('cursor'):
             return jsonify({'success': False, 'error': 'No history found for this user'}), 404
 
-        return jsonify({
+        response = {
             'success': True,
-            'predictions': [{
-                'id': p.id,
-                'user_id': p.user_id,
-                'risk_score': p.risk_score,
-                'risk_level': p.risk_level,
-                'created_at': p.created_at.isoformat(),
-                'age': p.age,
-                'gender': p.gender,
-                'current_smoker': p.current_smoker,
-                'cigs_per_day': p.cigs_per_day,
-                'bp_meds': p.bp_meds,
-                'prevalent_stroke': p.prevalent_stroke,
-                'prevalent_hyp': p.prevalent_hyp,
-                'diabetes': p.diabetes,
-                'sys_bp': p.sys_bp,
-                'dia_bp': p.dia_bp,
-                'bmi': p.bmi
-            } for p in predictions]
-        })
+            'predictions': page.items
+        }
+        if page.paginated:
+            response['next_cursor'] = page.next_cursor
+        return jsonify(response)
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logging.error(f"Error fetching prediction history: {e}")
+        logger.error("Error fetching prediction history: %s", e)
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
 
+def predict_and_save(input_data):
+    """Scores one /predictData record, stores the prediction and returns the response `result`."""
+    # Process the input data
+    processed_data = {
+        'user_id': int(input_data.get('user_id', 0)),
+        'gender': int(float(input_data.get('gender', 0))),
+        'age': int(float(input_data.get('age', 0))),
+        'currentSmoker': int(float(input_data.get('currentSmoker', 0))),
+        'cigsPerDay': float(input_data.get('cigsPerDay', 0.0)),
+        'BPMeds': int(float(input_data.get('BPMeds', 0))),
+        'prevalentStroke': int(float(input_data.get('prevalentStroke', 0))),
+        'prevalentHyp': int(float(input_data.get('prevalentHyp', 0))),
+        'diabetes': int(float(input_data.get('diabetes', 0))),
+        'sysBP': float(input_data.get('sysBP', 0.0)),
+        'diaBP': float(input_data.get('diaBP', 0.0)),
+        'BMI': float(input_data.get('BMI', 0.0)),
+    }
+
+    # Calculate derived features
+    processed_data['BP_ratio'] = processed_data['sysBP'] / processed_data['diaBP'] if processed_data['diaBP'] != 0 else 0.0
+    processed_data['hypertension'] = 1 if (processed_data['sysBP'] >= 140 or processed_data['diaBP'] >= 90) else 0
+    processed_data['BMI_category'] = calculate_bmi_category(processed_data['BMI'])
+
+    # Create DataFrame for model input
+    input_df = pd.DataFrame([{feature: processed_data.get(feature, 0) for feature in EXPECTED_FEATURES}])
+
+    # Get prediction from the model
+    with timed('model_dp'):
+        prediction = model_registry.get('dp').predict(input_df)
+    risk_score = float(prediction[0][0])
+    risk_percentage = min(max(risk_score * 100, 0), 100)
+    risk_level = get_risk_level(risk_percentage)
+    risk_results = calculate_risk_score(prediction, processed_data)
+
+
+    # Save prediction to database
+    prediction_record = HealthPrediction(
+        user_id=processed_data['user_id'],
+        gender=processed_data['gender'],
+        age=processed_data['age'],
+        current_smoker=processed_data['currentSmoker'],
+        cigs_per_day=processed_data['cigsPerDay'],
+        bp_meds=processed_data['BPMeds'],
+        prevalent_stroke=processed_data['prevalentStroke'],
+        prevalent_hyp=processed_data['prevalentHyp'],
+        diabetes=processed_data['diabetes'],
+        sys_bp=processed_data['sysBP'],
+        dia_bp=processed_data['diaBP'],
+        bmi=processed_data['BMI'],
+        risk_score=risk_percentage,
+        risk_level=risk_level,
+        confidence=round(risk_percentage/100, 2)
+    )
+    
+    try:
+        db.session.add(prediction_record)
+        db.session.commit()
+        prediction_id = prediction_record.id
+    except Exception as db_error:
+        db.session.rollback()
+        logger.error("Database error: %s", db_error)
+        prediction_id = None
+
+    return {
+        'riskScore': risk_results['riskPercentage'],
+        'riskLevel': risk_results['riskLevel'],
+        'confidence': risk_results['confidence'],
+        'heartDiseaseRisk': risk_results['riskPercentage'],
+        'strokeRisk': risk_results['riskPercentage'],
+        'diabetesRisk': risk_results['riskPercentage']
+    }
+
+
+@job_handler('dp_predict')
+def dp_predict_job(payload, data):
+    return {'success': True, 'result': predict_and_save(payload['input_data'])}
+
+
 @dpmodel_bp.route('/predictData', methods=['POST','OPTIONS'])
 @cross_origin(origins=['http://localhost:3000'])
 def predict_health_risk():
     if request.method == "OPTIONS":  # Handle preflight request
         return jsonify({"status": "ok"}), 200
     try:
-        print("Received request method:", request.method)
         request_data = request.get_json()
         
         if not request_data or 'data' not in request_data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
 
         input_data = request_data['data'][0]
-        print("Input data:", input_data)
-
-        # Process the input data
-        processed_data = {
-            'user_id': int(input_data.get('user_id', 0)),
-            'gender': int(float(input_data.get('gender', 0))),
-            'age': int(float(input_data.get('age', 0))),
-            'currentSmoker': int(float(input_data.get('currentSmoker', 0))),
-            'cigsPerDay': float(input_data.get('cigsPerDay', 0.0)),
-            'BPMeds': int(float(input_data.get('BPMeds', 0))),
-            'prevalentStroke': int(float(input_data.get('prevalentStroke', 0))),
-            'prevalentHyp': int(float(input_data.get('prevalentHyp', 0))),
-            'diabetes': int(float(input_data.get('diabetes', 0))),
-            'sysBP': float(input_data.get('sysBP', 0.0)),
-            'diaBP': float(input_data.get('diaBP', 0.0)),
-            'BMI': float(input_data.get('BMI', 0.0)),
-        }
+        logger.debug("Input data: %s", input_data)
 
-        # Calculate derived features
-        processed_data['BP_ratio'] = processed_data['sysBP'] / processed_data['diaBP'] if processed_data['diaBP'] != 0 else 0.0
-        processed_data['hypertension'] = 1 if (processed_data['sysBP'] >= 140 or processed_data['diaBP'] >= 90) else 0
-        processed_data['BMI_category'] = calculate_bmi_category(processed_data['BMI'])
-
-        # Create DataFrame for model input
-        input_df = pd.DataFrame([{feature: processed_data.get(feature, 0) for feature in EXPECTED_FEATURES}])
-
-        # Get prediction from the model
-        prediction = dp_model.predict(input_df)
-        risk_score = float(prediction[0][0])
-        risk_percentage = min(max(risk_score * 100, 0), 100)
-        risk_level = get_risk_level(risk_percentage)
-        risk_results = calculate_risk_score(prediction, processed_data)
-
-
-        # Save prediction to database
-        prediction_record = HealthPrediction(
-            user_id=processed_data['user_id'],
-            gender=processed_data['gender'],
-            age=processed_data['age'],
-            current_smoker=processed_data['currentSmoker'],
-            cigs_per_day=processed_data['cigsPerDay'],
-            bp_meds=processed_data['BPMeds'],
-            prevalent_stroke=processed_data['prevalentStroke'],
-            prevalent_hyp=processed_data['prevalentHyp'],
-            diabetes=processed_data['diabetes'],
-            sys_bp=processed_data['sysBP'],
-            dia_bp=processed_data['diaBP'],
-            bmi=processed_data['BMI'],
-            risk_score=risk_percentage,
-            risk_level=risk_level,
-            confidence=round(risk_percentage/100, 2)
-        )
-        
-        try:
-            db.session.add(prediction_record)
-            db.session.commit()
-            prediction_id = prediction_record.id
-        except Exception as db_error:
-            db.session.rollback()
-            logging.error(f"Database error: {str(db_error)}")
-            prediction_id = None
+        # With ?async=1 the prediction runs on the job workers and the client polls /jobs/<id>
+        if wants_async():
+            return enqueue_job('dp_predict', {'input_data': input_data})
 
         return jsonify({
             'success': True,
-            'result': {
-                'riskScore': risk_results['riskPercentage'],
-                'riskLevel': risk_results['riskLevel'],
-                'confidence': risk_results['confidence'],
-                'heartDiseaseRisk': risk_results['riskPercentage'],
-                'strokeRisk': risk_results['riskPercentage'],
-                'diabetesRisk': risk_results['riskPercentage']
-            }
+            'result': predict_and_save(input_data)
         })
 
 
     except Exception as e:
-        print(f"Error processing request: {str(e)}")
+        logger.error("Error processing request: %s", e)
         error_response = jsonify({
             'success': False,
             'error': f'Internal server error: {str(e)}'
         })
         
-        return error_response, 500
\ No newline at end of file
+        return error_response, 500
+
+
+@dpmodel_bp.route('/predictBatch', methods=['POST', 'OPTIONS'])
+@cross_origin(origins=['http://localhost:3000'])
+def predict_health_risk_batch():
+    if request.method == "OPTIONS":  # Handle preflight request
+        return jsonify({"status": "ok"}), 200
+    try:
+        request_data = request.get_json()
+
+        if not request_data or not isinstance(request_data.get('data'), list) or not request_data['data']:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+        records = request_data['data']
+        max_records = current_app.config.get('DP_BATCH_MAX_RECORDS', 10000)
+        if len(records) > max_records:
+            return jsonify({'success': False, 'error': f'At most {max_records} records per request'}), 413
+
+        if not all(isinstance(record, dict) for record in records):
+            return jsonify({'success': False, 'error': 'Each record must be an object'}), 400
+
+        df, errors = build_feature_frame(records)
+        if df.empty:
+            return jsonify({'success': False, 'error': 'No valid records', 'errors': errors}), 400
+
+        # Score every record in a single model call
+        with timed('model_dp'):
+            predictions = model_registry.get('dp').predict(
+                df[EXPECTED_FEATURES], batch_size=current_app.config.get('DP_PREDICT_BATCH_SIZE', 1024), verbose=0)
+        risk_results = calculate_risk_scores(predictions, df)
+        stored_risk_percentages = np.clip(predictions[:, 0].astype(float) * 100, 0, 100)
+
+        # Save all predictions with one bulk insert, leaving out records whose user does not exist
+        # so one bad user_id cannot fail the whole insert
+        saved = 0
+        save_failed = False
+        if request_data.get('save', True):
+            known = known_user_ids(int(user_id) for user_id in df['user_id'])
+            rows = []
+            for row, risk_percentage in zip(df.itertuples(), stored_risk_percentages):
+                if row.user_id not in known:
+                    errors.append({'index': int(row.Index), 'error': f'Unknown user_id: {row.user_id}'})
+                    continue
+                rows.append({
+                    'user_id': int(row.user_id),
+                    'gender': int(row.gender),
+                    'age': int(row.age),
+                    'current_smoker': int(row.currentSmoker),
+                    'cigs_per_day': float(row.cigsPerDay),
+                    'bp_meds': int(row.BPMeds),
+                    'prevalent_stroke': int(row.prevalentStroke),
+                    'prevalent_hyp': int(row.prevalentHyp),
+                    'diabetes': int(row.diabetes),
+                    'sys_bp': float(row.sysBP),
+                    'dia_bp': float(row.diaBP),
+                    'bmi': float(row.BMI),
+                    'risk_score': float(risk_percentage),
+                    'risk_level': get_risk_level(risk_percentage),
+                    'confidence': round(risk_percentage / 100, 2)
+                })
+            errors.sort(key=lambda error: error['index'])
+
+            if rows:
+                try:
+                    db.session.execute(insert(HealthPrediction), rows)
+                    db.session.commit()
+                    saved = len(rows)
+                except Exception as db_error:
+                    db.session.rollback()
+                    logger.error("Database error: %s", db_error)
+                    save_failed = True
+
+        results = [{
+            'index': int(index),
+            'riskScore': float(risk_percentage),
+            'riskLevel': str(risk_level),
+            'confidence': float(confidence)
+        } for index, risk_percentage, risk_level, confidence in zip(
+            df.index, risk_results['riskPercentage'], risk_results['riskLevel'], risk_results['confidence'])]
+
+        if save_failed:
+            # The scores are still returned, but the client must not assume they were stored
+            return jsonify({
+                'success': False,
+                'error': 'Failed to save predictions',
+                'results': results,
+                'errors': errors,
+                'saved': 0
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'results': results,
+            'errors': errors,
+            'saved': saved
+        })
+
+    except Exception as e:
+        logger.error("Error processing batch request: %s", e)
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
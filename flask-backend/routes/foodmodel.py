@@ -1,34 +1,77 @@
-from flask import Flask, request, jsonify, Blueprint, send_from_directory
+import logging
+from flask import Flask, request, jsonify, Blueprint, send_from_directory, current_app
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from ultralytics import YOLO
 import numpy as np
 from PIL import Image, ImageDraw
+from io import BytesIO
 import os
 import re
-import tensorflow as tf
 import json
+import threading
 from models import *
 from extensions import db
 from routes.gpt import generate_response
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select
+from models.foodscan import NUTRIENT_KEYS, nutrition_totals, parse_ingredients
+from concurrent.futures import ThreadPoolExecutor
+from services.model_registry import model_registry
+from services.inference_scheduler import detect
+from services.cache import enhancement_cache_key, get_enhancement_cache, get_prediction_cache, image_cache_key
+from services.nutrition_index import nutrition_index
+from services.nutrition_rollup import COUNTERS, add_scans, remove_scans
+from services.job_queue import enqueue_job, job_handler, wants_async
+from services.metrics import timed
+from services.batch_ingest import BatchError, batch_response, ingest_batch, parse_timestamp, read_batch, require
+from services.pagination import PaginationError, paginate_records, stream_records, wants_stream
 
 # Define the Blueprint
 foodmodel_bp = Blueprint('foodmodel', __name__)
-
-# Load the pre-trained model
-model_path = os.path.join(
-    os.getcwd(), 'aimodels/food/food_classifier_model.keras')
-model = tf.keras.models.load_model(model_path)
-
-ingredients_model_path = os.path.join(
-    os.getcwd(), 'aimodels/food/ingredient_detection_best.pt')
-ingredients_model = YOLO(ingredients_model_path)
+logger = logging.getLogger(__name__)
 
 # Ensure uploads directory exists
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Thread pools of the food pipeline -> config key of their size. The classifier runs next to YOLO
+# on its own pool, so classification never waits behind other requests' image writes.
+PIPELINE_EXECUTORS = {
+    'classifier': 'FOOD_CLASSIFIER_WORKERS',
+    'uploads': 'FOOD_UPLOAD_WORKERS',
+}
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name):
+    """Returns the named pipeline thread pool, sized from the app config on first use."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=current_app.config.get(PIPELINE_EXECUTORS[name], 4),
+                                              thread_name_prefix=f'food-{name}')
+                _executors[name] = executor
+    return executor
+
+# Fields returned by the food scan history endpoint: output name -> (model attribute, formatter)
+FOODSCAN_FIELDS = {
+    'id': ('id', None),
+    'food_name': ('food_name', None),
+    'food_image': ('food_image', None),
+    'ingredients': ('ingredients', json.dumps),  # Stored as native JSON, still returned as a JSON string
+    'total_calories': ('total_calories', None),
+    'total_carb': ('total_carb', None),
+    'total_protein': ('total_protein', None),
+    'total_fat': ('total_fat', None),
+    'timestamp': ('timestamp', lambda value: value.isoformat()),  # Convert to string for JSON
+}
+
+# Longest date range /api/foodscans/<user_id>/summary accepts, in days
+SUMMARY_MAX_DAYS = 366
+
 # Define allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
@@ -52,137 +95,185 @@ def serve_uploaded_file2(filename):
 
 @foodmodel_bp.route('/identify-food', methods=['POST'])
 def detect_food():
-    print("[INFO] Starting food detection process.")
-
-    # Define the upload directory
-    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    print(f"[INFO] Upload folder set to: {UPLOAD_FOLDER}")
+    logger.debug("Starting food detection process.")
 
     # Check if an image file was sent in the request
     if 'image' not in request.files:
-        print("[ERROR] No image part in the request.")
+        logger.warning("No image part in the request.")
         return jsonify({"error": "No image part"}), 400
 
     file = request.files['image']
     if file.filename == '':
-        print("[ERROR] No file selected.")
+        logger.warning("No file selected.")
         return jsonify({"error": "No selected file"}), 400
 
     # Validate and process the uploaded file
     if file and allowed_file(file.filename):
         try:
-            # Secure the file name and determine the save path
+            # Secure the file name; the upload is kept in memory and decoded only once
             filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            print(f"[INFO] Saving uploaded file to: {filepath}")
+            image_bytes = file.read()
 
-            # Save the file to the server
-            file.save(filepath)
+            # With ?async=1 the analysis runs on the job workers and the client polls /jobs/<id>
+            if wants_async():
+                return enqueue_job('identify_food', {'filename': filename}, image_bytes)
 
-            # Process the saved image to detect food and ingredients
-            print("[INFO] Processing the uploaded image.")
-            food_data = process_image(filepath)
+            result = analyse_food_image(image_bytes, filename)
 
             # Handle any errors during image processing
-            if "error" in food_data:
-                error_message = food_data["error"]
-                print(
-                    f"[ERROR] Error during image processing: {error_message}")
-                return jsonify({"error": error_message}), 500
+            if "error" in result:
+                return jsonify({"error": result["error"]}), 500
 
             # Return the detected food data as a JSON response
-            print("[INFO] Successfully detected food and ingredients.")
-            return jsonify({
-                "name": food_data['name'],
-                # Include detected ingredients
-                "ingredients": food_data['ingredients'],
-                # Relative path to the uploaded image
-                "image": f"/uploads/{filename}"
-            })
+            logger.info("Successfully detected food and ingredients.")
+            return jsonify(result)
 
         except Exception as e:
             error_message = f"Error processing the image: {str(e)}"
-            print(f"[ERROR] {error_message}")
+            logger.error(error_message)
             return jsonify({"error": error_message}), 500
     else:
-        print("[ERROR] Invalid file type.")
+        logger.warning("Invalid file type.")
         return jsonify({"error": "Invalid file type"}), 400
 
+
+def analyse_food_image(image_bytes, filename):
+    """Runs the food pipeline on uploaded image bytes and returns the /identify-food response body."""
+    with timed('decode'):
+        img = Image.open(BytesIO(image_bytes)).convert('RGB')
+
+    # Process the decoded image to detect food and ingredients
+    logger.debug("Processing the uploaded image.")
+    food_data = process_image(img)
+
+    if "error" in food_data:
+        logger.error("Error during image processing: %s", food_data['error'])
+        return {"error": food_data["error"]}
+
+    # Persisting the images is optional; both are written on the upload pool, and a path is only
+    # returned once its file exists, so clients can fetch it straight away
+    saves = {}
+    if current_app.config.get('FOOD_SAVE_UPLOADS', True):
+        saves['image'] = (filename, get_executor('uploads').submit(
+            save_image, image_bytes, os.path.join(UPLOAD_FOLDER, filename)))
+    if current_app.config.get('FOOD_SAVE_ANNOTATED', False):
+        annotated_filename = f"annotated_{filename}"
+        saves['annotated_image'] = (annotated_filename, get_executor('uploads').submit(
+            save_annotated_image, img, food_data.get('detections', []), os.path.join(UPLOAD_FOLDER, annotated_filename)))
+    paths = {key: f"/uploads/{name}" if future.result() else None for key, (name, future) in saves.items()}
+    image_path = paths.get('image')
+    annotated_image_path = paths.get('annotated_image')
+
+    return {
+        "name": food_data['name'],
+        # Include detected ingredients
+        "ingredients": food_data['ingredients'],
+        # Relative path to the uploaded image
+        "image": image_path,
+        "annotated_image": annotated_image_path
+    }
+
+
+@job_handler('identify_food')
+def identify_food_job(payload, image_bytes):
+    result = analyse_food_image(image_bytes, payload['filename'])
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
 # Image processing and prediction function
 
 
-def process_image(filepath):
+def process_image(img):
     try:
-        print("[INFO] Opening and preprocessing the image.")
+        logger.debug("Preprocessing the image.")
 
-        # Open image using PIL
-        img = Image.open(filepath)
+        # Return the stored result if this exact image was analysed before
+        cache = get_prediction_cache()
+        cache_key = image_cache_key(img, 'food_classifier', 'food_ingredients') if cache else None
+        if cache:
+            cached_result = cache.get(cache_key)
+            if cached_result is not None:
+                logger.debug("Returning cached food prediction.")
+                return cached_result
 
         # Preprocess image for model input (assuming the model expects 128x128 images)
-        img = img.resize((128, 128))
-        img_array = np.array(img) / 255.0  # Normalize the image
+        with timed('preprocess'):
+            resized_img = img.resize((128, 128))
+            img_array = np.asarray(resized_img) / 255.0  # Normalize the image
 
-        # Expand dimensions to match the model input shape (batch_size, height, width, channels)
-        img_array = np.expand_dims(img_array, axis=0)
-        print("[INFO] Image preprocessing completed.")
+            # Expand dimensions to match the model input shape (batch_size, height, width, channels)
+            img_array = np.expand_dims(img_array, axis=0)
+        logger.debug("Image preprocessing completed.")
 
-        # Get prediction from the food classification model
-        print("[INFO] Predicting food type from the image.")
-        predictions = model.predict(img_array)
+        # Start the food classification model in the background; it does not depend on YOLO
+        logger.debug("Predicting food type from the image.")
+        classifier_future = get_executor('classifier').submit(classify_food, img_array)
 
-        # Predict ingredients using the YOLO model
-        print("[INFO] Predicting ingredients using the YOLO model.")
+        # Predict ingredients using the YOLO model while the classifier runs
+        logger.debug("Predicting ingredients using the YOLO model.")
         try:
-            ingredients_json = predict_ingredients(filepath)
+            ingredients_json = predict_ingredients(img)
             detected_ingredients = parse_ingredients_json(ingredients_json)
         except Exception as e:
             error_message = f"Error during ingredients prediction: {str(e)}"
-            print(f"[ERROR] {error_message}")
+            logger.error(error_message)
             return {"error": error_message}
 
-        # Map the model's prediction to a food label
-        food_name = map_prediction_to_data(predictions)
-        print(f"[INFO] Predicted food: {food_name}")
-
         # Fetch nutritional data for the detected ingredients
         ingredients_with_nutritional_data = []
-        for ingredient_name, quantity in detected_ingredients.items():
-            nutritional_data = get_ingredient_data(
-                ingredient_name, quantity=quantity)
-            if nutritional_data:
-                ingredients_with_nutritional_data.append(nutritional_data)
-
-        print(
-            f"[INFO] Ingredient list with nutritional data: {ingredients_with_nutritional_data}")
+        with timed('nutrition_lookup'):
+            for ingredient_name, quantity in detected_ingredients.items():
+                nutritional_data = get_ingredient_data(
+                    ingredient_name, quantity=quantity)
+                if nutritional_data:
+                    ingredients_with_nutritional_data.append(nutritional_data)
+
+        logger.debug("Ingredient list with nutritional data: %s", ingredients_with_nutritional_data)
+
+        # Map the model's prediction to a food label (waits for the classifier if still running)
+        food_name = map_prediction_to_data(classifier_future.result())
+        logger.info("Predicted food: %s", food_name)
         
         enhanced_ingredients = enhance_gpt(food_name, ingredients_with_nutritional_data)
 
         try:
-            return {
+            result = {
                 "name": food_name,
-                "ingredients": enhanced_ingredients
+                "ingredients": enhanced_ingredients,
                 # "ingredients": ingredients_with_nutritional_data
+                "detections": ingredients_json
             }
+            # Only cache complete results, not GPT failures
+            if cache and isinstance(enhanced_ingredients, list):
+                cache.set(cache_key, result)
+            return result
         except Exception as e:
             error_message = f"Error enhancing ingredients: {str(e)}"
-            print(f"[ERROR] {error_message}")
+            logger.error(error_message)
             return {
                 "name": food_name,
                 "ingredients": ingredients_with_nutritional_data
             }
 
     except Exception as e:
-        print(f"[ERROR] Error in process_image: {str(e)}")
+        logger.error("Error in process_image: %s", e)
         return {"error": f"Error in process_image: {str(e)}"}
 
 
+# Run the food classification model
+
+
+def classify_food(img_array):
+    with timed('model_food_classifier'):
+        return model_registry.get('food_classifier').predict(img_array)
+
 # Map model prediction to food name
 
 
 def map_prediction_to_data(predictions):
     try:
-        print("[INFO] Mapping prediction to food label.")
+        logger.debug("Mapping prediction to food label.")
         # Get the index of the highest probability
         predicted_class_index = np.argmax(predictions)
 
@@ -196,10 +287,10 @@ def map_prediction_to_data(predictions):
 
         # Get the predicted food name
         food_name = food_labels[predicted_class_index]
-        print(f"[INFO] Prediction mapped to food: {food_name}")
+        logger.debug("Prediction mapped to food: %s", food_name)
         return food_name
     except Exception as e:
-        print(f"[ERROR] Error in map_prediction_to_data: {str(e)}")
+        logger.error("Error in map_prediction_to_data: %s", e)
         return "Unknown Food"
 
 # Parse JSON data for ingredients
@@ -207,7 +298,7 @@ def map_prediction_to_data(predictions):
 
 def parse_ingredients_json(json_data):
     try:
-        print("[INFO] Parsing detected ingredients JSON.")
+        logger.debug("Parsing detected ingredients JSON.")
         if isinstance(json_data, str):
             json_data = json.loads(json_data)
 
@@ -217,51 +308,86 @@ def parse_ingredients_json(json_data):
             if name:
                 ingredient_count[name] = ingredient_count.get(name, 0) + 1
 
-        print(f"[INFO] Parsed ingredients: {ingredient_count}")
+        logger.debug("Parsed ingredients: %s", ingredient_count)
         return ingredient_count
     except Exception as e:
-        print(f"[ERROR] Error in parse_ingredients_json: {str(e)}")
+        logger.error("Error in parse_ingredients_json: %s", e)
         return {}
 
 # Predict ingredients using the YOLO model
 
 
-def predict_ingredients(filepath):
+def predict_ingredients(img):
     try:
-        print("[INFO] Running YOLO ingredients detection.")
-        results = ingredients_model.predict(
-            source=filepath,
+        logger.debug("Running YOLO ingredients detection.")
+        detections = detect(
+            'food_ingredients',
+            img,
             conf=0.5,
-            device="cpu",
-            save=True
+            device="cpu"
         )
-        print("[INFO] YOLO prediction completed.")
-        return results[0].to_json()
+        logger.debug("YOLO prediction completed.")
+        return [
+            {
+                "name": detections.names[class_id],
+                "class": int(class_id),
+                "confidence": float(confidence),
+                "box": [float(value) for value in box_values]
+            }
+            for box_values, confidence, class_id in zip(detections.xywh, detections.conf, detections.cls)
+        ]
     except Exception as e:
-        print(f"[ERROR] Error in predict_ingredients: {str(e)}")
+        logger.error("Error in predict_ingredients: %s", e)
         raise e
 
 
+# Save the uploaded image; returns whether it was written
+
+
+def save_image(image_bytes, filepath):
+    try:
+        with timed('save_upload'), open(filepath, 'wb') as f:
+            f.write(image_bytes)
+        return True
+    except Exception as e:
+        logger.error("Error saving image to %s: %s", filepath, e)
+        return False
+
+# Draw the detected ingredient boxes onto a copy of the image and save it; returns whether it was written
+
+
+def save_annotated_image(img, detections, filepath):
+    try:
+        annotated = img.copy()
+        draw = ImageDraw.Draw(annotated)
+        for detection in detections:
+            x_center, y_center, width, height = detection["box"]
+            draw.rectangle(
+                [x_center - width / 2, y_center - height / 2, x_center + width / 2, y_center + height / 2],
+                outline="red", width=3)
+            draw.text((x_center - width / 2 + 4, y_center - height / 2 + 4),
+                      f"{detection['name']} {detection['confidence']:.2f}", fill="red")
+        annotated.save(filepath)
+        return True
+    except Exception as e:
+        logger.error("Error saving annotated image to %s: %s", filepath, e)
+        return False
+
+
 def get_ingredient_data(name, quantity=1):
     try:
-        print(f"[INFO] Fetching nutritional data for ingredient: {name}")
-        ingredient = Ingredient.query.filter_by(name=name).first()
+        logger.debug("Fetching nutritional data for ingredient: %s", name)
+        ingredient = nutrition_index.get(name)
         if not ingredient:
-            print(f"[INFO] No nutritional data found for ingredient: {name}")
+            logger.debug("No nutritional data found for ingredient: %s", name)
             return None
 
         return {
-            "name": ingredient.name,
-            "calories": ingredient.calories,
-            "carb": ingredient.carb,
-            "protein": ingredient.protein,
-            "fat": ingredient.fat,
-            "increment_type": ingredient.increment_type,
+            **ingredient,
             "quantity": quantity  # Include quantity in the return value
         }
     except Exception as e:
-        print(
-            f"[ERROR] Error retrieving nutritional data for ingredient {name}: {str(e)}")
+        logger.error("Error retrieving nutritional data for ingredient %s: %s", name, e)
         return None
 
 
@@ -270,7 +396,16 @@ def get_ingredient_data(name, quantity=1):
 
 def enhance_gpt(food_name, ingredients_with_nutritional_data):
     try:
-        print("[INFO] Enhancing ingredient list using OpenAI API.")
+        # Repeat dishes with the same detected ingredients skip the LLM entirely
+        cache = get_enhancement_cache()
+        cache_key = enhancement_cache_key(food_name, ingredients_with_nutritional_data) if cache else None
+        if cache:
+            cached_ingredients = cache.get(cache_key)
+            if cached_ingredients is not None:
+                logger.debug("Returning cached ingredient enhancement.")
+                return cached_ingredients
+
+        logger.debug("Enhancing ingredient list using OpenAI API.")
         
         # Prepare the role
         role = "You are a culinary and nutrition expert robot."
@@ -286,15 +421,19 @@ def enhance_gpt(food_name, ingredients_with_nutritional_data):
 
         # Call the OpenAI API
         response = generate_response(prompt, role)
-        print(f"[INFO] GPT response: {response}")
+        logger.debug("GPT response: %s", response)
 
         enhanced_ingredients_json = extract_json(response)
-        print(f"[INFO] Enhanced ingredient list: {enhanced_ingredients_json}")
+        logger.debug("Enhanced ingredient list: %s", enhanced_ingredients_json)
+
+        # Only successful enhancements are cached
+        if cache and isinstance(enhanced_ingredients_json, list):
+            cache.set(cache_key, enhanced_ingredients_json)
         return enhanced_ingredients_json
 
     except Exception as e:
         error_message = f"Error during OpenAI API call: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return error_message
 
 def extract_json(gpt_response):
@@ -324,7 +463,7 @@ def extract_json(gpt_response):
 
     except Exception as e:
         error_message = f"Error extracting JSON: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return {"error": error_message}
     
 @foodmodel_bp.route('/api/ingredients', methods=['POST'])
@@ -332,7 +471,7 @@ def add_ingredient():
     try:
         # Parse JSON data from the request
         data = request.json
-        print("[INFO] Received data to add ingredient:", data)
+        logger.debug("Received data to add ingredient: %s", data)
 
         # Create a new Ingredient object
         new_ingredient = Ingredient(
@@ -348,12 +487,16 @@ def add_ingredient():
         db.session.add(new_ingredient)
         db.session.commit()
 
-        print("[INFO] Ingredient added successfully:", new_ingredient.name)
+        # Make the new ingredient visible to food scans straight away
+        nutrition_index.refresh()
+
+        logger.info("Ingredient added successfully: %s", new_ingredient.name)
         return jsonify({"message": "Ingredient added successfully"}), 201
 
     except Exception as e:
+        db.session.rollback()
         error_message = f"Error adding ingredient: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return jsonify({"error": "Failed to add ingredient"}), 500
 
 
@@ -362,7 +505,7 @@ def add_dish():
     try:
         # Parse JSON data from the request
         data = request.json
-        print("[INFO] Received data to add dish:", data)
+        logger.debug("Received data to add dish: %s", data)
 
         # Create a new Dish object
         new_dish = Dish(
@@ -375,12 +518,13 @@ def add_dish():
         db.session.add(new_dish)
         db.session.commit()
 
-        print("[INFO] Dish added successfully:", new_dish.name)
+        logger.info("Dish added successfully: %s", new_dish.name)
         return jsonify({"message": "Dish added successfully"}), 201
 
     except Exception as e:
+        db.session.rollback()
         error_message = f"Error adding dish: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return jsonify({"error": "Failed to add dish"}), 500
 
 
@@ -390,11 +534,11 @@ def get_all_dishes():
         dishes = Dish.query.all()
         dishes_data = [{"id": dish.id, "name": dish.name, "avg_calories": dish.avg_calories,
                         "ingredients": dish.ingredients} for dish in dishes]
-        print("[INFO] Retrieved all dishes successfully")
+        logger.debug("Retrieved all dishes successfully")
         return jsonify(dishes_data), 200
     except Exception as e:
         error_message = f"Error retrieving dishes: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return jsonify({"error": error_message}), 500
 
 
@@ -404,11 +548,11 @@ def get_all_ingredients():
         ingredients = Ingredient.query.all()
         ingredients_data = [{"id": ingredient.id, "name": ingredient.name, "calories": ingredient.calories, "carb": ingredient.carb,
                              "protein": ingredient.protein, "fat": ingredient.fat, "increment_type": ingredient.increment_type} for ingredient in ingredients]
-        print("[INFO] Retrieved all ingredients successfully")
+        logger.debug("Retrieved all ingredients successfully")
         return jsonify(ingredients_data), 200
     except Exception as e:
         error_message = f"Error retrieving ingredients: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return jsonify({"error": error_message}), 500
 
 
@@ -417,7 +561,7 @@ def get_dish_by_name(name):
     try:
         dish = Dish.query.filter_by(name=name).first()
         if not dish:
-            print(f"[INFO] Dish with name '{name}' not found")
+            logger.debug("Dish with name '%s' not found", name)
             return jsonify({"error": "Dish not found"}), 404
 
         dish_data = {
@@ -426,11 +570,11 @@ def get_dish_by_name(name):
             "avg_calories": dish.avg_calories,
             "ingredients": dish.ingredients
         }
-        print(f"[INFO] Retrieved dish: {dish.name}")
+        logger.debug("Retrieved dish: %s", dish.name)
         return jsonify(dish_data), 200
     except Exception as e:
         error_message = f"Error retrieving dish: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return jsonify({"error": error_message}), 500
 
 
@@ -439,7 +583,7 @@ def get_ingredient_by_name(name):
     try:
         ingredient = Ingredient.query.filter_by(name=name).first()
         if not ingredient:
-            print(f"[INFO] Ingredient with name '{name}' not found")
+            logger.debug("Ingredient with name '%s' not found", name)
             return jsonify({"error": "Ingredient not found"}), 404
 
         ingredient_data = {
@@ -451,18 +595,18 @@ def get_ingredient_by_name(name):
             "fat": ingredient.fat,
             "increment_type": ingredient.increment_type
         }
-        print(f"[INFO] Retrieved ingredient: {ingredient.name}")
+        logger.debug("Retrieved ingredient: %s", ingredient.name)
         return jsonify(ingredient_data), 200
     except Exception as e:
         error_message = f"Error retrieving ingredient: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
         return jsonify({"error": error_message}), 500
 
 @foodmodel_bp.route('/api/foodscan', methods=['POST'])
 def create_foodscan():
     try:
         data = request.get_json()
-        print(f"[INFO] Received data for FoodScan creation: {data}")
+        logger.debug("Received data for FoodScan creation: %s", data)
 
         food_name = data.get('food_name')
         food_image = data.get('food_image')
@@ -472,41 +616,179 @@ def create_foodscan():
         if not all([food_name, food_image, ingredients, user_id]):
             missing_fields = [field for field in ['food_name', 'food_image', 'ingredients', 'user_id'] if not data.get(field)]
             error_message = f"Missing fields in request: {', '.join(missing_fields)}"
-            print(f"[ERROR] {error_message}")
+            logger.error(error_message)
             return jsonify({'error': error_message}), 400
 
         foodscan = FoodScan(
             food_name=food_name,
             food_image=food_image,
             ingredients=ingredients,
-            user_id=user_id
+            user_id=user_id,
+            timestamp=datetime.utcnow()
         )
         db.session.add(foodscan)
+        add_scans([foodscan])
         db.session.commit()
         
-        print(f"[INFO] FoodScan successfully created with ID: {foodscan.id}")
+        logger.info("FoodScan successfully created with ID: %s", foodscan.id)
         return jsonify({'message': 'FoodScan created successfully!', 'id': foodscan.id}), 201
 
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': f"Invalid ingredients: {str(e)}"}), 400
     except Exception as e:
+        db.session.rollback()
         error_message = f"Error creating FoodScan: {str(e)}"
-        print(f"[ERROR] {error_message}")
+        logger.error(error_message)
+        return jsonify({'error': error_message}), 500
+
+def build_foodscan_row(record):
+    require(record, 'food_name', 'food_image', 'ingredients', 'user_id')
+    ingredients = parse_ingredients(record['ingredients'])
+    return {
+        'food_name': record['food_name'],
+        'food_image': record['food_image'],
+        'ingredients': ingredients,
+        **nutrition_totals(ingredients),
+        'user_id': int(record['user_id']),
+        # Scans captured offline keep the time they were taken, so they count on that day
+        'timestamp': parse_timestamp(record.get('timestamp')) or datetime.utcnow()
+    }
+
+
+@foodmodel_bp.route('/api/foodscans/batch', methods=['POST'])
+def create_foodscans_batch():
+    """Creates many FoodScans in one transaction; see services/batch_ingest.py."""
+    try:
+        results, saved = ingest_batch(FoodScan, read_batch(), build_foodscan_row, on_insert=add_scans)
+        logger.info("FoodScan batch saved %d of %d records", saved, len(results))
+        return batch_response(results, saved)
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        logger.error("Error creating FoodScan batch: %s", e)
+        return jsonify({'error': f"Error creating FoodScan batch: {str(e)}"}), 500
+
+@foodmodel_bp.route('/api/foodscan/<int:scan_id>', methods=['DELETE'])
+def delete_foodscan(scan_id):
+    try:
+        foodscan = db.session.get(FoodScan, scan_id)
+        if not foodscan:
+            return jsonify({'error': 'FoodScan not found'}), 404
+
+        db.session.delete(foodscan)
+        remove_scans([foodscan])
+        db.session.commit()
+
+        logger.info("FoodScan %s deleted", scan_id)
+        return jsonify({'message': 'FoodScan deleted successfully'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        error_message = f"Error deleting FoodScan: {str(e)}"
+        logger.error(error_message)
         return jsonify({'error': error_message}), 500
 
 @foodmodel_bp.route('/api/foodscans/<int:user_id>', methods=['GET'])
 def get_foodscans_by_user(user_id):
     try:
-        foodscans = FoodScan.query.filter_by(user_id=user_id).all()
-        result = [
-            {
-                'id': scan.id,
-                'food_name': scan.food_name,
-                'food_image': scan.food_image,
-                'ingredients': scan.ingredients,
-                'timestamp': scan.timestamp.isoformat(),  # Convert to string for JSON
-            }
-            for scan in foodscans
-        ]
-        return jsonify(result), 200
+        query = FoodScan.query.filter_by(user_id=user_id)
+        if wants_stream():
+            return stream_records(query, FoodScan, 'timestamp', FOODSCAN_FIELDS)
+
+        page = paginate_records(query, FoodScan, 'timestamp', FOODSCAN_FIELDS)
+        if page.paginated:
+            return jsonify({'items': page.items, 'next_cursor': page.next_cursor}), 200
+        return jsonify(page.items), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print("[ERROR] Error fetching FoodScans:", str(e))
+        logger.error("Error fetching FoodScans: %s", e)
         return jsonify({'error': f"Error fetching FoodScans: {str(e)}"}), 500
+
+
+def parse_summary_range():
+    """Reads ?start=YYYY-MM-DD&end=YYYY-MM-DD (both inclusive); defaults to the 30 days ending today."""
+    end = date.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow().date()
+    start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=29)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days >= SUMMARY_MAX_DAYS:
+        raise ValueError(f"At most {SUMMARY_MAX_DAYS} days per request")
+    return start, end
+
+
+@foodmodel_bp.route('/api/foodscans/<int:user_id>/summary', methods=['GET'])
+def get_foodscan_summary(user_id):
+    """Calories and macros per day for one user, summed by the database from the per-scan totals."""
+    try:
+        start, end = parse_summary_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        day = func.date(FoodScan.timestamp).label('day')
+        totals = [func.sum(getattr(FoodScan, column)).label(column) for column in NUTRIENT_KEYS]
+        rows = db.session.execute(
+            select(day, func.count(FoodScan.id).label('scans'), *totals)
+            .where(FoodScan.user_id == user_id,
+                   FoodScan.timestamp >= datetime.combine(start, datetime.min.time()),
+                   FoodScan.timestamp < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+            .group_by(day)
+            .order_by(day)
+        ).all()
+
+        days = [{
+            'date': str(row.day),
+            'scans': row.scans,
+            **{column: round(getattr(row, column) or 0, 2) for column in NUTRIENT_KEYS}
+        } for row in rows]
+        return jsonify({
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'days': days,
+            'totals': {
+                'scans': sum(item['scans'] for item in days),
+                **{column: round(sum(item[column] for item in days), 2) for column in NUTRIENT_KEYS}
+            }
+        }), 200
+    except Exception as e:
+        logger.error("Error summarising FoodScans: %s", e)
+        return jsonify({'error': f"Error summarising FoodScans: {str(e)}"}), 500
+
+
+@foodmodel_bp.route('/api/foodscans/<int:user_id>/daily', methods=['GET'])
+def get_daily_nutrition(user_id):
+    """
+    Precomputed per-day totals for one user (see services/nutrition_rollup.py).
+
+    Same range parameters as /summary, but reads one rollup row per day instead
+    of the user's scans; days without scans are omitted.
+    """
+    try:
+        start, end = parse_summary_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        rollups = db.session.scalars(
+            select(DailyNutrition)
+            .where(DailyNutrition.user_id == user_id, DailyNutrition.day >= start, DailyNutrition.day <= end)
+            .order_by(DailyNutrition.day)
+        ).all()
+        days = [{
+            'date': rollup.day.isoformat(),
+            'scans': rollup.scans,
+            **{column: round(getattr(rollup, column), 2) for column in NUTRIENT_KEYS}
+        } for rollup in rollups]
+        return jsonify({
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'days': days,
+            'totals': {column: round(sum(item[column] for item in days), 2) for column in COUNTERS}
+        }), 200
+    except Exception as e:
+        logger.error("Error fetching daily nutrition: %s", e)
+        return jsonify({'error': f"Error fetching daily nutrition: {str(e)}"}), 500
@@ -1,31 +1,30 @@
-from openai import OpenAI
+import logging
+from contextlib import closing
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, Blueprint
+from flask import Flask, request, jsonify, Blueprint, stream_with_context
 import os
-import requests
+from services.llm_gateway import LLMBusyError, get_llm_gateway
+from services.streaming import sse_response
+from services.chat_tools import run_chat_tool, tool_definitions
+from services.identity import optional_user_id
 
 # Load environment variables from the .env file
 load_dotenv()
 
 gpt_bp = Blueprint('gpt', __name__)
+logger = logging.getLogger(__name__)
 
 # Access the OpenAI API key
 openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
-    print("ERROR: OPENAI_API_KEY not found in environment variables.")
-
-try:
-    client = OpenAI(api_key=openai_api_key)
-    print("OpenAI client initialized successfully.")
-except Exception as e:
-    print(f"ERROR initializing OpenAI client: {str(e)}")
+    logger.warning("OPENAI_API_KEY not found in environment variables.")
 
 
 @gpt_bp.route("/generate", methods=["POST"])
 def generate_response(role, prompt):
     try:
-        print(f"generate_response called with role: {role}, prompt: {prompt}")
-        completion = client.chat.completions.create(
+        logger.debug("generate_response called with role: %s, prompt: %s", role, prompt)
+        completion = get_llm_gateway().chat_completion(
             model="gpt-4o",
             messages=[
                 {"role": "developer", "content": role},
@@ -35,109 +34,184 @@ def generate_response(role, prompt):
                 }
             ]
         )
-        print(f"OpenAI response: {completion.choices[0].message.content}")
+        logger.debug("OpenAI response: %s", completion.choices[0].message.content)
         return completion.choices[0].message.content
     except Exception as e:
-        print(f"ERROR in generate_response: {str(e)}")
+        logger.error("Error in generate_response: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
-@gpt_bp.route("/chat_response", methods=["POST"])
-def generate_response_chat():
-    try:
-        # Parse JSON from the request body
-        data = request.get_json()
-        print("Incoming data:", data)  # Log full request data
-
-        memory = data.get("memory")
-        print("Extracted memory:", memory)  # Log extracted memory array
+class ChatRequestError(Exception):
+    """Raised while preparing a chat request; carries the HTTP status to respond with."""
 
-        if not memory:
-            return jsonify({"error": "The 'memory' field is required."}), 400
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
 
-        # Extract the latest user message from the memory
-        user_input = next((msg["content"] for msg in reversed(
-            memory) if msg["role"] == "user"), None)
-        print("Extracted user input:", user_input)  # Log extracted user input
 
-        if not user_input:
-            return jsonify({"error": "No user input found in the memory."}), 400
+def build_chat_memory(data, with_tools):
+    """Validates the chat request and returns the message list for the completion."""
+    memory = data.get("memory")
+    logger.debug("Extracted memory: %s", memory)  # Log extracted memory array
 
-        api_json = [{"description": "Gets all of a user's food scans",
-            "url": "http://localhost:3001/foodmodel/api/foodscans/<int:user_id>"}]
+    if not memory:
+        raise ChatRequestError("The 'memory' field is required.", 400)
 
-        api_url = identify_intent(user_input, api_json)
+    # Extract the latest user message from the memory
+    user_input = next((msg["content"] for msg in reversed(
+        memory) if msg["role"] == "user"), None)
+    logger.debug("Extracted user input: %s", user_input)  # Log extracted user input
 
-        if not api_url or not api_url.startswith("http"):
-            print(f"Invalid API URL identified: {api_url}")
-            return jsonify({"error": "Failed to identify a valid API URL."}), 500
+    if not user_input:
+        raise ChatRequestError("No user input found in the memory.", 400)
 
-        # Execute the API URL
-        try:
-            api_response = requests.get(api_url)
-            api_response.raise_for_status()
-            api_result = api_response.json()  # Assuming the API returns JSON
-        except Exception as e:
-            print(f"Error while calling the API: {e}")
-            return jsonify({"error": "Failed to retrieve data from the identified API."}), 500
+    if not with_tools:
+        return list(memory)
 
-        # Include api_result in the context for the GPT model
-        system_message = {
-            "role": "system",
-            "content": f"The API returned the following data: {api_result}. Use this information to answer the user's query."
-        }
+    system_message = {
+        "role": "system",
+        "content": "You can look up the user's food scans, health predictions and oral or skin analyses "
+                   "with the provided tools. Use them when the user's query needs that data."
+    }
+    return [system_message] + memory
 
-        # Add system message to memory
-        updated_memory = [system_message] + memory
 
-        # Generate the response
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=updated_memory,
-        )
+def run_tool_calls(messages, content, tool_calls, user_id):
+    """
+    Runs the requested tools in-process (no HTTP call back into this server).
 
-        return jsonify({
-            "response": completion.choices[0].message.content
-            # "api_url": api_url,
-            # "api_result": api_result
+    `content` is any text the model wrote alongside the calls, and `tool_calls`
+    are `{"id", "name", "arguments"}` dicts. Returns `messages` with
+    the assistant's tool call message and one result message per call appended,
+    ready for the completion that writes the final answer.
+    """
+    tool_messages = [{
+        "role": "assistant",
+        "content": content,
+        "tool_calls": [{
+            "id": call["id"],
+            "type": "function",
+            "function": {"name": call["name"], "arguments": call["arguments"]}
+        } for call in tool_calls]
+    }]
+    for call in tool_calls:
+        logger.info("Running chat tool: %s", call["name"])
+        tool_messages.append({
+            "role": "tool",
+            "tool_call_id": call["id"],
+            "content": run_chat_tool(call["name"], user_id)
         })
-
-    except Exception as e:
-        print("Error in /chat_response:", str(e))  # Log exception
-        return jsonify({"error": str(e)}), 500
+    return messages + tool_messages
 
 
+def resolve_tool_calls(messages, user_id):
+    """
+    Runs the first completion with the local data tools available.
 
-def identify_intent(user_input, api_descriptions):
+    If the model answers directly, returns `(messages, answer)`. If it asks for
+    tools, they are run and their results appended, returning `(messages, None)`
+    so the caller can request the final answer.
     """
-    Identifies the intent of the user's input and maps it to the most suitable API URL.
+    if user_id is None:
+        # Without a signed-in user there is no data to look up
+        return messages, None
+
+    completion = get_llm_gateway().chat_completion(
+        model="gpt-4o",
+        messages=messages,
+        tools=tool_definitions(),
+    )
+    message = completion.choices[0].message
+    if not message.tool_calls:
+        return messages, message.content
 
-    Args:
-        user_input (str): The input from the user.
-        api_descriptions (list): A list of dictionaries with "description" and "url" keys.
+    tool_calls = [{"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                  for call in message.tool_calls]
+    return run_tool_calls(messages, message.content, tool_calls, user_id), None
 
-    Returns:
-        str: The URL of the most suitable API based on the user's intent.
+
+def stream_with_tools(messages, user_id):
     """
+    Yields the answer text as it is generated, running the data tools when the model asks for them.
 
-    # Prepare the prompt for the OpenAI API
-    api_descriptions_text = "\n".join(
-        [f"Description: {api['description']}\nURL: {api['url']}" for api in api_descriptions]
-    )
+    The first completion is streamed with the tools offered: its text goes out as
+    soon as it arrives, while the tool call fragments are collected. If there were
+    any, the tools run and a second streamed completion writes the answer.
+    """
+    gateway = get_llm_gateway()
+    if user_id is None:
+        # Without a signed-in user there is no data to look up
+        yield from gateway.stream_chat_completion(model="gpt-4o", messages=messages)
+        return
+
+    content = []
+    tool_calls = {}
+    with closing(gateway.stream_chat_deltas(model="gpt-4o", messages=messages, tools=tool_definitions())) as deltas:
+        for delta in deltas:
+            if delta.content:
+                content.append(delta.content)
+                yield delta.content
+            for fragment in delta.tool_calls or []:
+                # Each call arrives in pieces keyed by its index: the id and name first, then the arguments
+                call = tool_calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+                if fragment.id:
+                    call["id"] = fragment.id
+                if fragment.function:
+                    call["name"] += fragment.function.name or ""
+                    call["arguments"] += fragment.function.arguments or ""
+    if not tool_calls:
+        return
+
+    messages = run_tool_calls(messages, ''.join(content) or None,
+                              [tool_calls[index] for index in sorted(tool_calls)], user_id)
+    yield from gateway.stream_chat_completion(model="gpt-4o", messages=messages)
 
-    prompt = (
-        "The following are API descriptions with their respective URLs. Based on the user's input, determine the most suitable API URL. "
-        "Return only the URL.\n\n"
-        f"User input: {user_input}\n\n"
-        f"API descriptions:\n{api_descriptions_text}\n\n"
-        "Suitable API URL:"
-    )
 
+@gpt_bp.route("/chat_response", methods=["POST"])
+def generate_response_chat():
     try:
-        # Call the OpenAI API using generate_response
-        role = "You are an assistant that maps user queries to appropriate API URLs."
-        url = generate_response(role, prompt)
-        return url.strip()
+        # Parse JSON from the request body
+        data = request.get_json()
+        logger.debug("Incoming data: %s", data)  # Log full request data
+
+        # Tools only ever read the signed-in user's data, never a user named in the body
+        user_id = optional_user_id()
+        updated_memory, answer = resolve_tool_calls(build_chat_memory(data, user_id is not None), user_id)
+
+        # Generate the response unless the first completion already answered
+        if answer is None:
+            completion = get_llm_gateway().chat_completion(
+                model="gpt-4o",
+                messages=updated_memory,
+            )
+            answer = completion.choices[0].message.content
+
+        return jsonify({
+            "response": answer
+        })
+
+    except ChatRequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except LLMBusyError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
-        print(f"Error while identifying intent: {e}")
-        return None
+        logger.error("Error in /chat_response: %s", e)  # Log exception
+        return jsonify({"error": str(e)}), 500
+
+
+# Same as /chat_response, but streams the answer as server-sent events
+@gpt_bp.route("/chat_response/stream", methods=["POST"])
+def stream_response_chat():
+    try:
+        data = request.get_json()
+        user_id = optional_user_id()
+        # The tools query the database, possibly after the first tokens went out, so keep the app context
+        return sse_response(stream_with_context(stream_with_tools(build_chat_memory(data, user_id is not None), user_id)))
+
+    except ChatRequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except LLMBusyError as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error("Error in /chat_response/stream: %s", e)  # Log exception
+        return jsonify({"error": str(e)}), 500
@@ -1,17 +1,30 @@
 # Gregory Achilles Chua 220502T
 
+import logging
 from flask import Blueprint, request, jsonify
-from ultralytics import YOLO
 from io import BytesIO
 from PIL import Image
 import os
 from datetime import datetime
 from extensions import db
 from models.oral_analysis_history import OralAnalysisHistory
+from services.batch_ingest import BatchError, batch_response, ingest_batch, parse_timestamp, read_batch, require
+from services.pagination import PaginationError, paginate_records, stream_records, wants_stream
 
 
 # Define the Blueprint
 history_bp = Blueprint('history', __name__)
+logger = logging.getLogger(__name__)
+
+# Fields returned by the history endpoint: output name -> (model attribute, formatter)
+HISTORY_FIELDS = {
+    'id': ('id', None),
+    'user_id': ('user_id', None),
+    'original_image_path': ('original_image_path', None),
+    'predictions': ('predictions', None),  # This will be the full JSON string from the database
+    'condition_count': ('condition_count', None),
+    'analysis_date': ('analysis_date', lambda value: value.strftime('%Y-%m-%d %H:%M:%S')),  # Format date if needed
+}
 
 @history_bp.route('/oha/save-results', methods=['POST'])
 def save_results():
@@ -36,7 +49,32 @@ def save_results():
         return jsonify({'message': 'Results saved successfully'}), 200
 
     except Exception as e:
-        print(f"Error saving history: {str(e)}")
+        db.session.rollback()
+        logger.error("Error saving history: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+def build_history_row(record):
+    require(record, 'user_id', 'original_image_path', 'predictions', 'condition_count')
+    return {
+        'user_id': int(record['user_id']),
+        'original_image_path': record['original_image_path'],
+        'predictions': record['predictions'],
+        'condition_count': int(record['condition_count']),
+        'analysis_date': parse_timestamp(record.get('analysis_date')) or datetime.utcnow()
+    }
+
+
+@history_bp.route('/oha/save-results/batch', methods=['POST'])
+def save_results_batch():
+    """Saves many analysis results in one transaction; see services/batch_ingest.py."""
+    try:
+        results, saved = ingest_batch(OralAnalysisHistory, read_batch(), build_history_row)
+        return batch_response(results, saved)
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        logger.error("Error saving history batch: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -49,29 +87,25 @@ def get_history():
 
     try:
         # Query the OralAnalysisHistory table for the user's past analysis results
-        history = OralAnalysisHistory.query.filter_by(user_id=user_id).all()
+        query = OralAnalysisHistory.query.filter_by(user_id=user_id)
+        if wants_stream():
+            return stream_records(query, OralAnalysisHistory, 'analysis_date', HISTORY_FIELDS)
+
+        page = paginate_records(query, OralAnalysisHistory, 'analysis_date', HISTORY_FIELDS)
 
         # If no history is found
-        if not history:
+        if not page.items and not request.args.get('cursor'):
             return jsonify({'message': 'No history found for the given user ID'}), 404
 
-        # Serialize the results to JSON format
-        history_data = []
-        for record in history:
-            record_data = {
-                'id': record.id,
-                'user_id': record.user_id,
-                'original_image_path': record.original_image_path,
-                'predictions': record.predictions,  # This will be the full JSON string from the database
-                'condition_count': record.condition_count,
-                'analysis_date': record.analysis_date.strftime('%Y-%m-%d %H:%M:%S')  # Format date if needed
-            }
-            history_data.append(record_data)
-
-        return jsonify({'history': history_data}), 200
+        response = {'history': page.items}
+        if page.paginated:
+            response['next_cursor'] = page.next_cursor
+        return jsonify(response), 200
 
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error fetching history: {str(e)}")
+        logger.error("Error fetching history: %s", e)
         return jsonify({'error': str(e)}), 500
     
     
@@ -97,5 +131,6 @@ def delete_history():
         return jsonify({'message': 'History record deleted successfully'}), 200
 
     except Exception as e:
-        print(f"Error deleting history: {str(e)}")
+        db.session.rollback()
+        logger.error("Error deleting history: %s", e)
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+
+from services.job_queue import get_job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+# Status (and, once finished, the result) of a job submitted with ?async=1
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
@@ -1,28 +1,28 @@
 # Gregory Achilles Chua 220502T
 
+import logging
 from flask import Blueprint, request, jsonify, current_app, session
-from ultralytics import YOLO
 from io import BytesIO
 from PIL import Image
 import os
-import google.generativeai as google_gen_ai
+from services.llm_gateway import LLMBusyError, get_llm_gateway
+from services.streaming import sse_response
+from services.inference_scheduler import detect
+from services.cache import get_prediction_cache, image_cache_key
+from services.job_queue import enqueue_job, job_handler, wants_async
+from services.metrics import timed
 
 # Define the Blueprint
 ohamodel_bp = Blueprint('ohamodel', __name__)
-
-# Load YOLOv8 model (Replace with your model path if needed)
-model_path = os.path.join(os.getcwd(), 'aimodels/oha/best.pt')
-model = YOLO(model_path)
+logger = logging.getLogger(__name__)
 
 # Generative AI Google Gemini model
-# Initialize Google Gemini AI API
-def get_gen_ai_model():
+# Initialize Google Gemini AI API (the model and its client are shared through the LLM gateway)
+def get_gen_ai_api_key():
     api_key = current_app.config.get("GREGORY_GEMINI_API_KEY")  # Use .get() to avoid errors if key is missing
     if not api_key:
         raise ValueError("API key for Google Gemini AI is missing")
-    
-    google_gen_ai.configure(api_key=api_key)
-    return google_gen_ai.GenerativeModel("gemini-pro")
+    return api_key
 
 
 @ohamodel_bp.route('/predict', methods=['POST'])
@@ -36,39 +36,77 @@ def predict():
         return jsonify({'error': 'No selected file'}), 400
 
     try:
-        print(f"Received file: {file.filename}")  # Debugging line
+        logger.debug("Received file: %s", file.filename)
+        # With ?async=1 the prediction runs on the job workers and the client polls /jobs/<id>
+        if wants_async():
+            return enqueue_job('oha_predict', data=file.read())
+
         # Convert the image to the format YOLOv8 expects
-        img = Image.open(file.stream)
-        
-        # Run inference on the image using YOLOv8
-        results = model(img)  # Run inference on the image
-        print(f"Results: {results}")  # Debugging line
-        
-        # Extract predictions from the results
-        predictions = []
-        for result in results:
-            # Access bounding boxes and labels (assuming results is a list)
-            for box in result.boxes:
-                # Convert the box object into a list or array format
-                box_values = box.xywh[0].cpu().numpy()  # Accessing box as tensor and converting to NumPy array
-                prediction = {
-                    'pred_class': int(box.cls.cpu().item()),  # Ensure class is an integer
-                    'confidence': float(box.conf.cpu().item()),  # Ensure confidence is a float
-                    'x_center': float(box_values[0]),  # Extract the x-center
-                    'y_center': float(box_values[1]),  # Extract the y-center
-                    'width': float(box_values[2]),  # Extract the width
-                    'height': float(box_values[3]),  # Extract the height
-                }
-                predictions.append(prediction)
+        with timed('decode'):
+            img = Image.open(file.stream)
+            img.load()
+        predictions = predict_oral_conditions(img)
 
         # Return the predictions in a JSON format
         return jsonify({'predictions': predictions})
 
     except Exception as e:
-        print(f"Error: {e}")  # Debugging line
+        logger.error("Error in prediction: %s", e)
         return jsonify({'error': str(e)}), 500
     
 
+def predict_oral_conditions(img):
+    """Returns the oral condition detections for a PIL image, using the prediction cache when enabled."""
+    # Return the stored predictions if this exact image was analysed before
+    cache = get_prediction_cache()
+    cache_key = image_cache_key(img, 'oha') if cache else None
+    if cache:
+        cached_predictions = cache.get(cache_key)
+        if cached_predictions is not None:
+            return cached_predictions
+
+    # Run inference on the image using YOLOv8 (batched with other concurrent requests)
+    detections = detect('oha', img)
+
+    # Extract predictions from the detections
+    predictions = []
+    for box_values, confidence, class_id in zip(detections.xywh, detections.conf, detections.cls):
+        prediction = {
+            'pred_class': int(class_id),  # Ensure class is an integer
+            'confidence': float(confidence),  # Ensure confidence is a float
+            'x_center': float(box_values[0]),  # Extract the x-center
+            'y_center': float(box_values[1]),  # Extract the y-center
+            'width': float(box_values[2]),  # Extract the width
+            'height': float(box_values[3]),  # Extract the height
+        }
+        predictions.append(prediction)
+
+    if cache:
+        cache.set(cache_key, predictions)
+    return predictions
+
+
+@job_handler('oha_predict')
+def oha_predict_job(payload, img_bytes):
+    return {'predictions': predict_oral_conditions(Image.open(BytesIO(img_bytes)))}
+
+
+def build_chat_prompt(data):
+    instruction = data.get("instruction", "").strip()
+    results = data.get("results", "").strip()
+    message = data.get("message", "").strip()
+    chat_history = data.get("chat_history", "").strip()  # Accept chat history from frontend
+
+    # Check if this is the first message
+    if instruction and results:
+        # Store context in session
+        session["instruction"] = instruction
+        session["results"] = results
+        return f"{instruction}\n{results}\n\nUser: {message}"
+    # Use provided chat_history instead of reconstructing it
+    return chat_history + f"\nUser: {message}"
+
+
 # chat with context and chathistory
 @ohamodel_bp.route('/chat', methods=['POST'])
 def chat():
@@ -76,29 +114,31 @@ def chat():
         data = request.get_json()
         if not data:
             return jsonify({"error": "Request body is empty"}), 400
-        
-        instruction = data.get("instruction", "").strip()
-        results = data.get("results", "").strip()
-        message = data.get("message", "").strip()
-        chat_history = data.get("chat_history", "").strip()  # Accept chat history from frontend
-
-        model = get_gen_ai_model()
-
-        # Check if this is the first message
-        if instruction and results:
-            # Store context in session
-            session["instruction"] = instruction
-            session["results"] = results
-            full_chat_history = f"{instruction}\n{results}\n\nUser: {message}"
-        else:
-            # Use provided chat_history instead of reconstructing it
-            full_chat_history = chat_history + f"\nUser: {message}"
+
+        api_key = get_gen_ai_api_key()
+        full_chat_history = build_chat_prompt(data)
 
         # Generate AI response
-        response = model.generate_content(full_chat_history)
+        response = get_llm_gateway().gemini_generate(api_key, full_chat_history)
 
         return jsonify({"response": response.text})
 
+    except LLMBusyError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+# chat with context and chathistory, streamed as server-sent events
+@ohamodel_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Request body is empty"}), 400
+
+        api_key = get_gen_ai_api_key()
+        return sse_response(get_llm_gateway().stream_gemini_generate(api_key, build_chat_prompt(data)))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,17 +1,34 @@
+import logging
 from flask import Blueprint, request, jsonify
 from models.skin_analysis import SkinAnalysis
 from extensions import db
 from datetime import datetime
 import json
 from sqlalchemy import text
+from services.image_store import store_image_value, stored_image_url
+from services.batch_ingest import BatchError, batch_response, ingest_batch, parse_timestamp, read_batch, require
+from services.pagination import PaginationError, paginate_records, stream_records, wants_stream
+from services.identity import optional_user_id
 
 skin_analysis_bp = Blueprint('skin_analysis', __name__)
+logger = logging.getLogger(__name__)
+
+# Fields returned by the history endpoint: output name -> (model attribute, formatter)
+HISTORY_FIELDS = {
+    'id': ('id', None),
+    'imageUrl': ('image_url', stored_image_url),
+    'annotatedImageUrl': ('annotated_image_url', stored_image_url),  # Make sure this matches your frontend
+    'predictions': ('predictions', None),
+    'notes': ('notes', None),
+    'timestamp': ('timestamp', lambda value: value.isoformat()),
+    'userId': ('user_id', None)
+}
 
 @skin_analysis_bp.route('/save', methods=['POST'])
 def save_analysis():
     try:
         data = request.json
-        print("Received data for saving:", {
+        logger.debug("Received data for saving: %s", {
             'has_image': bool(data.get('imageUrl')),
             'has_annotated_image': bool(data.get('annotatedImageUrl')),
             'predictions_length': len(data.get('predictions', [])),
@@ -19,15 +36,16 @@ def save_analysis():
         })
 
         # Debug log the actual URLs (first 100 chars)
-        print("Image URLs:", {
+        logger.debug("Image URLs: %s", {
             'image_url': data.get('imageUrl')[:100] if data.get('imageUrl') else None,
             'annotated_url': data.get('annotatedImageUrl')[:100] if data.get('annotatedImageUrl') else None
         })
 
         analysis = SkinAnalysis(
             user_id=1,  # Replace with actual user ID from session
-            image_url=data.get('imageUrl'),
-            annotated_image_url=data.get('annotatedImageUrl'),
+            # Inline data URL images go to the image store; only their keys are saved
+            image_url=store_image_value(data.get('imageUrl')),
+            annotated_image_url=store_image_value(data.get('annotatedImageUrl')),
             predictions=data.get('predictions'),
             notes=data.get('notes', ''),
             timestamp=datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
@@ -37,7 +55,7 @@ def save_analysis():
         db.session.commit()
         
         # Debug log the saved analysis
-        print("Saved analysis:", {
+        logger.debug("Saved analysis: %s", {
             'id': analysis.id,
             'has_annotated_image': bool(analysis.annotated_image_url)
         })
@@ -48,35 +66,77 @@ def save_analysis():
         }), 201
     
     except Exception as e:
-        print(f"Error saving analysis: {str(e)}")
+        logger.error("Error saving analysis: %s", e)
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
     
+def build_analysis_row(record, signed_in_user_id=None):
+    """Signed-in uploads belong to the JWT user; without a token each record names its user_id."""
+    require(record, 'timestamp')
+    user_id = record.get('user_id')
+    if signed_in_user_id is not None:
+        if user_id not in (None, '') and int(user_id) != signed_in_user_id:
+            raise ValueError("user_id does not match the signed-in user")
+        user_id = signed_in_user_id
+    elif user_id in (None, ''):
+        raise ValueError("Missing fields: user_id")
+    return {
+        'user_id': int(user_id),
+        'image_url': store_image_value(record.get('imageUrl')),
+        'annotated_image_url': store_image_value(record.get('annotatedImageUrl')),
+        'predictions': record.get('predictions'),
+        'notes': record.get('notes', ''),
+        'timestamp': parse_timestamp(record['timestamp'])
+    }
+
+
+@skin_analysis_bp.route('/save/batch', methods=['POST'])
+def save_analysis_batch():
+    """Saves many analyses in one transaction; see services/batch_ingest.py."""
+    try:
+        user_id = optional_user_id()
+        # Unknown user_ids are rejected per record by ingest_batch
+        results, saved = ingest_batch(SkinAnalysis, read_batch(), lambda record: build_analysis_row(record, user_id))
+        return batch_response(results, saved)
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        logger.error("Error saving analysis batch: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
 @skin_analysis_bp.route('/history', methods=['GET'])
 def get_history():
     try:
-        analyses = SkinAnalysis.query.order_by(SkinAnalysis.timestamp.desc()).all()
-        analyses_list = [{
-            'id': analysis.id,
-            'imageUrl': analysis.image_url,
-            'annotatedImageUrl': analysis.annotated_image_url,  # Make sure this matches your frontend
-            'predictions': analysis.predictions,
-            'notes': analysis.notes,
-            'timestamp': analysis.timestamp.isoformat() if analysis.timestamp else None,
-            'userId': analysis.user_id
-        } for analysis in analyses]
+        user_id = request.args.get('user_id', type=int)
+        if user_id is None:
+            # Fall back to the signed-in user; listing every user's analyses is not allowed
+            user_id = optional_user_id()
+        if user_id is None:
+            return jsonify({'error': 'user_id is required'}), 400
+        query = SkinAnalysis.query.filter_by(user_id=user_id)
+
+        if wants_stream():
+            return stream_records(query, SkinAnalysis, 'timestamp', HISTORY_FIELDS)
+
+        page = paginate_records(query, SkinAnalysis, 'timestamp', HISTORY_FIELDS)
+        analyses_list = page.items
         
         # Debug log
-        if analyses_list:
-            print("First analysis data:", {
-                'id': analyses_list[0]['id'],
+        if analyses_list and 'annotatedImageUrl' in analyses_list[0] and 'predictions' in analyses_list[0]:
+            logger.debug("First analysis data: %s", {
+                'id': analyses_list[0].get('id'),
                 'hasAnnotatedImage': bool(analyses_list[0]['annotatedImageUrl']),
                 'predictionsLength': len(analyses_list[0]['predictions']) if isinstance(analyses_list[0]['predictions'], list) else 'not a list'
             })
         
+        if page.paginated:
+            return jsonify({'items': analyses_list, 'next_cursor': page.next_cursor})
         return jsonify(analyses_list)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error fetching analyses: {e}")
+        logger.error("Error fetching analyses: %s", e)
         return jsonify({'error': str(e)}), 500
     
 @skin_analysis_bp.route('/<int:analysis_id>', methods=['PUT'])
@@ -92,7 +152,7 @@ def update_analysis(analysis_id):
         return jsonify({'message': 'Analysis updated successfully'}), 200
     
     except Exception as e:
-        print(f"Error updating analysis: {e}")
+        logger.error("Error updating analysis: %s", e)
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
@@ -105,6 +165,6 @@ def delete_analysis(analysis_id):
         return jsonify({'message': 'Analysis deleted successfully'}), 200
     
     except Exception as e:
-        print(f"Error deleting analysis: {e}")
+        logger.error("Error deleting analysis: %s", e)
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
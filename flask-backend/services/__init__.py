@@ -0,0 +1 @@
+#Initialize service imports
\ No newline at end of file
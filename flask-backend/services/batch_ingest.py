@@ -0,0 +1,132 @@
+from datetime import datetime, timezone
+
+from flask import current_app, jsonify, request
+from sqlalchemy import insert, select
+
+from extensions import db
+from models.user import User
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch request; routes return it with `status`."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_batch():
+    """
+    Returns the records of a batch request.
+
+    The body is either a JSON list of records or an object with a `records`
+    list; at most INGEST_BATCH_MAX_RECORDS records are accepted per request.
+    """
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list) or not records:
+        raise BatchError("Expected a non-empty list of records")
+    max_records = current_app.config.get('INGEST_BATCH_MAX_RECORDS', 500)
+    if len(records) > max_records:
+        raise BatchError(f"At most {max_records} records per request", 413)
+    return records
+
+
+def require(record, *fields):
+    """Raises a ValueError naming the fields that are missing or empty in `record`."""
+    missing = [field for field in fields if record.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+
+def parse_timestamp(value):
+    """
+    Parses an ISO 8601 timestamp (a trailing "Z" included); None stays None.
+
+    Timestamps with an offset are converted to naive UTC, like the utcnow()
+    defaults of the models, so a record lands on the right day.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO 8601 string")
+    timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def known_user_ids(user_ids):
+    """Returns the subset of `user_ids` that exist, with a single lookup."""
+    if not user_ids:
+        return set()
+    return set(db.session.scalars(select(User.id).where(User.id.in_(set(user_ids)))))
+
+
+def bulk_insert(model, rows):
+    """
+    Inserts `rows` (dicts of column values) with one executemany INSERT.
+
+    Returns the new ids in the same order where the dialect can return them from
+    an executemany INSERT (SQLite, PostgreSQL, MariaDB). MySQL cannot, and the
+    ids of a multi-row insert are not guaranteed to be consecutive there, so it
+    returns None for each row instead of guessing them.
+    """
+    if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+        statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+        return list(db.session.scalars(statement, rows))
+    db.session.execute(insert(model), rows)
+    return [None] * len(rows)
+
+
+def ingest_batch(model, records, build_row, on_insert=None):
+    """
+    Validates `records` together, inserts the valid ones in bulk and commits once.
+
+    `build_row` turns one record into a dict of column values, raising ValueError
+    for an invalid record. Rows whose user_id does not exist are rejected with a
+    single lookup. `on_insert`, if given, is called with the inserted rows before
+    the commit, to update derived tables in the same transaction. Returns the
+    per-record results, in request order, each either
+    `{'index', 'id'}` (id is None where the database cannot return it, see
+    bulk_insert) or `{'index', 'error'}`, and the number of rows saved.
+    """
+    results = [None] * len(records)
+    rows, indexes = [], []
+    for index, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Each record must be an object")
+            rows.append(build_row(record))
+            indexes.append(index)
+        except (ValueError, TypeError) as e:
+            results[index] = {'index': index, 'error': str(e)}
+
+    user_ids = {row['user_id'] for row in rows}
+    if user_ids:
+        known = known_user_ids(user_ids)
+        valid = [(index, row) for index, row in zip(indexes, rows) if row['user_id'] in known]
+        for index, row in zip(indexes, rows):
+            if row['user_id'] not in known:
+                results[index] = {'index': index, 'error': f"Unknown user_id: {row['user_id']}"}
+        indexes = [index for index, _ in valid]
+        rows = [row for _, row in valid]
+
+    ids = []
+    if rows:
+        try:
+            ids = bulk_insert(model, rows)
+            if on_insert:
+                on_insert(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    for index, row_id in zip(indexes, ids):
+        results[index] = {'index': index, 'id': row_id}
+    return results, len(ids)
+
+
+def batch_response(results, saved):
+    """201 with the per-record results when anything was saved, 400 when every record was rejected."""
+    return jsonify({'results': results, 'saved': saved, 'failed': len(results) - saved}), 201 if saved else 400
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache:
+    """
+    JSON-serializable value cache with an in-process LRU tier and an optional on-disk tier.
+
+    Lookups check memory first, then disk (promoting disk hits into memory). The
+    disk tier stores one JSON file per key and evicts the least recently written
+    files once the directory grows past `disk_max_bytes`. With a `ttl` (seconds),
+    entries in both tiers expire that long after they were set.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None, disk_max_bytes=256 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                expires_at, value = self._entries[key]
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None or (entry[0] is not None and entry[0] <= now):
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._disk_hits += 1
+            self._store_memory(key, entry)
+            return entry[1]
+
+    def set(self, key, value):
+        entry = (time.time() + self.ttl if self.ttl else None, value)
+        with self._lock:
+            self._store_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir:
+            for filename in os.listdir(self.disk_dir):
+                if filename.endswith('.json'):
+                    os.remove(os.path.join(self.disk_dir, filename))
+
+    def _store_memory(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        """Returns the (expires_at, value) entry stored on disk for the key, or None."""
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if isinstance(data, dict) and set(data) == {'expires_at', 'value'}:
+            return data['expires_at'], data['value']
+        # Entries written before expiry support was added hold the bare value
+        return None, data
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        try:
+            # Write to a temp file first so readers never see a partial entry
+            temp_path = f"{self._disk_path(key)}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'expires_at': entry[0], 'value': entry[1]}, f)
+            os.replace(temp_path, self._disk_path(key))
+            self._evict_disk()
+        except OSError as e:
+            logger.warning("Could not write cache entry to disk: %s", e)
+
+    def _evict_disk(self):
+        files = []
+        total_bytes = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total_bytes <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0,
+                'disk_dir': self.disk_dir,
+            }
+
+
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Returns the shared prediction cache, or None when caching is disabled."""
+    global _prediction_cache
+    if not current_app.config.get('PREDICTION_CACHE_ENABLED', True):
+        return None
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = TieredCache(
+                    max_entries=current_app.config.get('PREDICTION_CACHE_SIZE', 1024),
+                    disk_dir=current_app.config.get('PREDICTION_CACHE_DIR') or None,
+                    disk_max_bytes=current_app.config.get('PREDICTION_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+                )
+    return _prediction_cache
+
+
+def prediction_cache_stats():
+    return _prediction_cache.stats() if _prediction_cache is not None else None
+
+
+_enhancement_cache = None
+_enhancement_cache_lock = threading.Lock()
+
+
+def get_enhancement_cache():
+    """Returns the shared cache for LLM ingredient enhancements, or None when disabled."""
+    global _enhancement_cache
+    if not current_app.config.get('ENHANCEMENT_CACHE_ENABLED', True):
+        return None
+    if _enhancement_cache is None:
+        with _enhancement_cache_lock:
+            if _enhancement_cache is None:
+                _enhancement_cache = TieredCache(
+                    max_entries=current_app.config.get('ENHANCEMENT_CACHE_SIZE', 512),
+                    disk_dir=current_app.config.get('ENHANCEMENT_CACHE_DIR') or None,
+                    disk_max_bytes=current_app.config.get('ENHANCEMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                    ttl=current_app.config.get('ENHANCEMENT_CACHE_TTL_SECONDS', 7 * 24 * 3600),
+                )
+    return _enhancement_cache
+
+
+def enhancement_cache_stats():
+    return _enhancement_cache.stats() if _enhancement_cache is not None else None
+
+
+def enhancement_cache_key(food_name, ingredients):
+    """
+    Builds a cache key from the food name and the detected ingredient -> quantity pairs.
+
+    Names are normalized (trimmed, lower-cased) and pairs sorted, so the same dish
+    with the same detections maps to the same key regardless of detection order.
+    """
+    signature = [
+        (food_name or '').strip().lower(),
+        sorted(((ingredient.get('name') or '').strip().lower(), ingredient.get('quantity'))
+               for ingredient in ingredients)
+    ]
+    return hashlib.sha256(json.dumps(signature).encode()).hexdigest()
+
+
+def image_cache_key(img, *model_names):
+    """
+    Builds a cache key from the decoded pixels of a PIL image and the models that process it.
+
+    The key includes each model's file version, so replacing a model file under
+    `aimodels/` makes all of its old entries unreachable.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{img.mode}:{img.size}".encode())
+    digest.update(img.tobytes())
+    for name in model_names:
+        digest.update(f"|{name}:{model_registry.version(name)}".encode())
+    return digest.hexdigest()
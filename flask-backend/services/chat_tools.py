@@ -0,0 +1,102 @@
+import json
+import logging
+
+from sqlalchemy.orm import load_only
+
+from models.foodscan import FoodScan
+from models.HealthPrediction import HealthPrediction
+from models.oral_analysis_history import OralAnalysisHistory
+from models.skin_analysis import SkinAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Most recent records handed to the model per tool call
+MAX_TOOL_RECORDS = 20
+
+# name -> (description, function(user_id))
+CHAT_TOOLS = {}
+
+
+def chat_tool(name, description):
+    """Registers a local data function the chat model can call for the current user."""
+    def register(function):
+        CHAT_TOOLS[name] = (description, function)
+        return function
+    return register
+
+
+def tool_definitions():
+    """Returns the registered tools in OpenAI function-calling format."""
+    return [{
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            # The user is always the one making the request, so the tools take no arguments
+            "parameters": {"type": "object", "properties": {}, "required": []}
+        }
+    } for name, (description, _) in CHAT_TOOLS.items()]
+
+
+def run_chat_tool(name, user_id):
+    """Runs a tool in-process and returns its result as a JSON string for the model."""
+    if name not in CHAT_TOOLS:
+        return json.dumps({"error": f"Unknown tool: {name}"})
+    try:
+        return json.dumps(CHAT_TOOLS[name][1](user_id), default=str)
+    except Exception as e:
+        logger.error("Error running chat tool '%s': %s", name, e)
+        return json.dumps({"error": f"Failed to retrieve data: {e}"})
+
+
+@chat_tool("get_food_scans", "Gets the user's most recent food scans with detected ingredients and nutrition.")
+def get_food_scans(user_id):
+    scans = (FoodScan.query.filter_by(user_id=user_id)
+             .order_by(FoodScan.timestamp.desc()).limit(MAX_TOOL_RECORDS).all())
+    return [{
+        'food_name': scan.food_name,
+        'ingredients': scan.ingredients,
+        'timestamp': scan.timestamp.isoformat()
+    } for scan in scans]
+
+
+@chat_tool("get_health_predictions", "Gets the user's most recent heart disease risk predictions and the inputs used.")
+def get_health_predictions(user_id):
+    predictions = (HealthPrediction.query.filter_by(user_id=user_id)
+                   .order_by(HealthPrediction.created_at.desc()).limit(MAX_TOOL_RECORDS).all())
+    return [{
+        'risk_score': p.risk_score,
+        'risk_level': p.risk_level,
+        'age': p.age,
+        'current_smoker': p.current_smoker,
+        'cigs_per_day': p.cigs_per_day,
+        'diabetes': p.diabetes,
+        'sys_bp': p.sys_bp,
+        'dia_bp': p.dia_bp,
+        'bmi': p.bmi,
+        'created_at': p.created_at.isoformat() if p.created_at else None
+    } for p in predictions]
+
+
+@chat_tool("get_oral_history", "Gets the user's most recent oral health analyses and detected conditions.")
+def get_oral_history(user_id):
+    records = (OralAnalysisHistory.query.filter_by(user_id=user_id)
+               .order_by(OralAnalysisHistory.analysis_date.desc()).limit(MAX_TOOL_RECORDS).all())
+    return [{
+        'predictions': record.predictions,
+        'condition_count': record.condition_count,
+        'analysis_date': record.analysis_date.isoformat() if record.analysis_date else None
+    } for record in records]
+
+
+@chat_tool("get_skin_history", "Gets the user's most recent skin (acne) analyses and notes.")
+def get_skin_history(user_id):
+    # Images are left out on purpose; they are large and the model cannot use them here
+    analyses = (SkinAnalysis.query.filter_by(user_id=user_id)
+                .options(load_only(SkinAnalysis.predictions, SkinAnalysis.notes, SkinAnalysis.timestamp))
+                .order_by(SkinAnalysis.timestamp.desc()).limit(MAX_TOOL_RECORDS).all())
+    return [{
+        'predictions': analysis.predictions,
+        'notes': analysis.notes,
+        'timestamp': analysis.timestamp.isoformat() if analysis.timestamp else None
+    } for analysis in analyses]
@@ -0,0 +1,24 @@
+import logging
+
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+
+logger = logging.getLogger(__name__)
+
+
+def optional_user_id():
+    """
+    Returns the id of the user signed in with this request's JWT, or None.
+
+    A missing, invalid or expired token counts as no user, and so does a JWT
+    setup that cannot read tokens at all (JWT_TOKEN_LOCATION unset raises a
+    RuntimeError in flask-jwt-extended).
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        return int(identity) if identity is not None else None
+    except (JWTExtendedException, PyJWTError, RuntimeError, ValueError, TypeError) as e:
+        logger.debug("No usable JWT identity: %s", e)
+        return None
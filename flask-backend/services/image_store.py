@@ -0,0 +1,132 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import threading
+
+from flask import current_app, url_for
+
+# Keys are the SHA-256 of the image bytes plus a file extension, e.g. "3a7bd3...e1.jpeg"
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+DATA_URL_PATTERN = re.compile(r'^data:(image/[a-zA-Z0-9.+-]+);base64,(.*)$', re.DOTALL)
+
+EXTENSIONS = {
+    'image/jpeg': 'jpeg',
+    'image/jpg': 'jpeg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+
+class ImageStore:
+    """Interface for image blob storage; rows in the database only keep the returned key."""
+
+    def put(self, data, content_type):
+        """Stores the image bytes and returns their key."""
+        raise NotImplementedError
+
+    def path(self, key):
+        """Returns a local file path for the key (only for stores backed by the filesystem)."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LocalImageStore(ImageStore):
+    """
+    Content-addressed image store on the local filesystem.
+
+    Identical images are stored once. Files are sharded into subdirectories by the
+    first two characters of their hash so no single directory grows too large.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def put(self, data, content_type):
+        extension = EXTENSIONS.get(content_type.lower())
+        if not extension:
+            raise ValueError(f"Unsupported image type: {content_type}")
+
+        key = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see a partial image
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return key
+
+    def path(self, key):
+        if not KEY_PATTERN.match(key):
+            raise ValueError("Invalid image key")
+        return os.path.join(self.root, key[:2], key)
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+IMAGE_STORE_BACKENDS = {
+    'local': lambda config: LocalImageStore(
+        config.get('IMAGE_STORE_DIR') or os.path.join(os.getcwd(), 'uploads/images')),
+}
+
+_image_store = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Returns the configured image store (IMAGE_STORE_BACKEND, "local" by default)."""
+    global _image_store
+    if _image_store is None:
+        with _image_store_lock:
+            if _image_store is None:
+                backend = current_app.config.get('IMAGE_STORE_BACKEND', 'local')
+                if backend not in IMAGE_STORE_BACKENDS:
+                    raise ValueError(f"Unknown IMAGE_STORE_BACKEND: {backend}")
+                _image_store = IMAGE_STORE_BACKENDS[backend](current_app.config)
+    return _image_store
+
+
+def parse_data_url(value):
+    """Returns (bytes, content type) for a base64 image data URL, or None for anything else."""
+    match = DATA_URL_PATTERN.match(value) if isinstance(value, str) else None
+    if not match:
+        return None
+    try:
+        return base64.b64decode(match.group(2), validate=False), match.group(1)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def store_image_value(value):
+    """
+    Moves an inline data URL image into the store and returns its key.
+
+    Values that are not data URLs (regular URLs, existing keys, None) are returned unchanged.
+    """
+    parsed = parse_data_url(value)
+    if parsed is None:
+        return value
+    data, content_type = parsed
+    return get_image_store().put(data, content_type)
+
+
+def is_image_key(value):
+    return isinstance(value, str) and bool(KEY_PATTERN.match(value))
+
+
+def stored_image_url(value):
+    """Turns a stored image key into a URL the frontend can load; other values pass through."""
+    if is_image_key(value):
+        return url_for('get_stored_image', key=value, _external=True)
+    return value
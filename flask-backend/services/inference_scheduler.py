@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+from flask import current_app
+
+from services.inference_server import get_inference_server, inference_server_enabled
+from services.metrics import timed
+from services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Per-image YOLO output as plain arrays: boxes (N, 4) in xywh, confidences (N,), class ids (N,)
+Detections = namedtuple('Detections', ['xywh', 'conf', 'cls', 'names'])
+
+
+def to_detections(result):
+    """Converts an ultralytics `Results` object into `Detections` arrays."""
+    boxes = result.boxes
+    return Detections(
+        xywh=boxes.xywh.cpu().numpy(),
+        conf=boxes.conf.cpu().numpy(),
+        cls=boxes.cls.cpu().numpy().astype(int),
+        names=result.names,
+    )
+
+
+class BatchScheduler:
+    """
+    Collects images submitted within a short window and runs them as one batched YOLO call.
+
+    Requests call `submit()` and wait on the returned future. A single background
+    thread takes the first queued image, keeps collecting until `max_batch_size`
+    images are queued or `max_wait_ms` has passed, then runs the whole batch in
+    one forward pass and hands each request its own `Detections`.
+    """
+
+    def __init__(self, model_name, max_batch_size=8, max_wait_ms=10, predict_kwargs=None):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.predict_kwargs = predict_kwargs or {}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._batches = 0
+        self._images = 0
+        self._batch_sizes = {}
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+
+    def submit(self, image):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((image, future, time.perf_counter()))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batch-scheduler-{self.model_name}", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            self._record(batch, started)
+            try:
+                model = model_registry.get(self.model_name)
+                results = model([image for image, _, _ in batch], **self.predict_kwargs)
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(to_detections(result))
+            except Exception as e:
+                logger.error("Batched inference failed for '%s': %s", self.model_name, e)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _record(self, batch, started):
+        with self._lock:
+            self._batches += 1
+            self._images += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for _, _, queued_at in batch:
+                wait = started - queued_at
+                self._total_queue_wait += wait
+                self._max_queue_wait = max(self._max_queue_wait, wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'model': self.model_name,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self._batches,
+                'images': self._images,
+                'avg_batch_size': round(self._images / self._batches, 2) if self._batches else 0,
+                'batch_size_counts': dict(sorted(self._batch_sizes.items())),
+                'avg_queue_wait_ms': round(self._total_queue_wait / self._images * 1000, 2) if self._images else 0,
+                'max_queue_wait_ms': round(self._max_queue_wait * 1000, 2),
+                'queued': self._queue.qsize(),
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model_name, **predict_kwargs):
+    """Returns the shared scheduler for a model and set of predict arguments, creating it if needed."""
+    key = (model_name, tuple(sorted(predict_kwargs.items())))
+    scheduler = _schedulers.get(key)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(key)
+            if scheduler is None:
+                scheduler = BatchScheduler(
+                    model_name,
+                    max_batch_size=current_app.config.get('INFERENCE_MAX_BATCH_SIZE', 8),
+                    max_wait_ms=current_app.config.get('INFERENCE_MAX_WAIT_MS', 10),
+                    predict_kwargs=predict_kwargs,
+                )
+                _schedulers[key] = scheduler
+    return scheduler
+
+
+def detect(model_name, image, **predict_kwargs):
+    """
+    Runs a YOLO model on one image.
+
+    In inference server mode the image goes to the worker processes; otherwise it
+    is batched with concurrent requests when batching is enabled.
+    """
+    with timed(f"model_{model_name}"):
+        if inference_server_enabled():
+            return get_inference_server().detect(model_name, image, **predict_kwargs)
+
+        if not current_app.config.get('INFERENCE_BATCHING', True):
+            results = model_registry.get(model_name)(image, **predict_kwargs)
+            return to_detections(results[0])
+
+        return get_scheduler(model_name, **predict_kwargs).submit(image).result()
+
+
+def scheduler_stats():
+    return [scheduler.stats() for scheduler in list(_schedulers.values())]
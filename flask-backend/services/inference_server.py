@@ -0,0 +1,326 @@
+import atexit
+import itertools
+import logging
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+
+import numpy as np
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Directory that contains the `services` package, so `python -m services.inference_server` resolves
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker_main(connection, cpus):
+    """
+    Request loop of an inference worker process.
+
+    Runs YOLO models from the registry on images read from shared memory and
+    sends `Detections` back over `connection`, one request at a time.
+    """
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+        try:
+            import torch
+            torch.set_num_threads(len(cpus))
+        except ImportError:
+            pass
+
+    from services.inference_scheduler import to_detections
+    from services.model_registry import model_registry
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        request_id, model_name, block_name, shape, predict_kwargs = message
+        try:
+            block = shared_memory.SharedMemory(name=block_name)
+            # The web process owns the block; without this the worker's own resource
+            # tracker would unlink it when the worker exits
+            resource_tracker.unregister(block._name, 'shared_memory')
+            try:
+                # ultralytics reads numpy images as BGR, the same conversion it applies to PIL images
+                image = np.ascontiguousarray(np.ndarray(shape, dtype=np.uint8, buffer=block.buf)[..., ::-1])
+            finally:
+                block.close()
+            results = model_registry.get(model_name)(image, **predict_kwargs)
+            connection.send((request_id, to_detections(results[0]), None))
+        except Exception as e:
+            connection.send((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+def main(argv=None):
+    """
+    Entry point of a worker process: `python -m services.inference_server <fd> [cpus]`.
+
+    Workers are started as their own interpreter on this module rather than with
+    multiprocessing, whose spawn and forkserver methods re-run the parent's main
+    script (app.py under `python app.py`) in every child. `fd` is the worker's end
+    of a socket pair shared with the web process; `cpus` is a comma separated list
+    of cores to pin to.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    cpus = {int(cpu) for cpu in argv[1].split(',')} if len(argv) > 1 and argv[1] else None
+    _worker_main(Connection(int(argv[0])), cpus)
+
+
+class InferenceServer:
+    """
+    Pool of long-lived processes that run the YOLO models outside the web process.
+
+    The web process copies each decoded RGB image into a preallocated shared
+    memory slot and queues only the slot name and shape, so pixel arrays are
+    never pickled. One I/O thread per worker takes the next request off the
+    queue, sends it over the worker's socket and hands the (small) detection
+    arrays back to the waiting request; a worker that dies is restarted and its
+    request fails. With `pin_cpus`, the available cores are split evenly between
+    the workers and each one is pinned to its share.
+    """
+
+    def __init__(self, workers=2, slot_bytes=3 * 1920 * 1920, slots=None, pin_cpus=False, timeout=60):
+        self.worker_count = workers
+        self.slot_bytes = slot_bytes
+        self.timeout = timeout
+        self._requests = queue.Queue()
+        self._cpu_sets = self._split_cpus(workers) if pin_cpus else [None] * workers
+        self._processes = [None] * workers
+        self._slots = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots or workers * 2)]
+        self._free_slots = queue.Queue()
+        for slot in self._slots:
+            self._free_slots.put(slot)
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Metrics
+        self._requests_total = 0
+        self._errors = 0
+        self._oversized = 0
+        self._restarts = 0
+        self._replaced_slots = 0
+        self._total_roundtrip = 0.0
+
+        self._io_threads = [
+            threading.Thread(target=self._serve_worker, args=(index,), name=f"inference-worker-{index}-io", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self._io_threads:
+            thread.start()
+
+    @staticmethod
+    def _split_cpus(workers):
+        cpus = sorted(os.sched_getaffinity(0))
+        share = max(len(cpus) // workers, 1)
+        return [set(cpus[(index * share) % len(cpus):][:share]) for index in range(workers)]
+
+    def _start_worker(self, index):
+        parent_socket, child_socket = socket.socketpair()
+        cpus = self._cpu_sets[index]
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get('PYTHONPATH')]))
+        try:
+            self._processes[index] = subprocess.Popen(
+                [sys.executable, '-m', 'services.inference_server', str(child_socket.fileno()),
+                 ','.join(map(str, sorted(cpus))) if cpus else ''],
+                pass_fds=(child_socket.fileno(),),
+                env=env,
+            )
+        finally:
+            # Only the worker keeps its end open, so a dead worker shows up as EOF here
+            child_socket.close()
+        return Connection(parent_socket.detach())
+
+    def _restart_worker(self, index, connection):
+        logger.error("Inference worker %d exited with code %s, restarting it", index, self._processes[index].poll())
+        with self._lock:
+            self._restarts += 1
+        connection.close()
+        return self._start_worker(index)
+
+    def _serve_worker(self, index):
+        connection = self._start_worker(index)
+        try:
+            while True:
+                message = self._requests.get()
+                if message is None:
+                    try:
+                        connection.send(None)
+                    except OSError:
+                        pass
+                    return
+                if self._processes[index].poll() is not None:
+                    # Died while idle: nothing was sent to it yet, so the request goes to its replacement
+                    connection = self._restart_worker(index, connection)
+                try:
+                    connection.send(message)
+                    _, detections, error = connection.recv()
+                except (EOFError, OSError):
+                    if self._closed:
+                        return
+                    connection = self._restart_worker(index, connection)
+                    self._complete(message[0], None, f"Inference worker {index} exited")
+                    continue
+                self._complete(message[0], detections, error)
+        finally:
+            connection.close()
+
+    def _complete(self, request_id, detections, error):
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+        if pending is None:
+            # The request already timed out
+            return
+        future, slot, started = pending
+        self._release(slot)
+        with self._lock:
+            self._total_roundtrip += time.perf_counter() - started
+            if error:
+                self._errors += 1
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(detections)
+
+    def _acquire(self, nbytes):
+        if nbytes > self.slot_bytes:
+            # Larger than a slot: use a one-off block that is unlinked once the reply arrives
+            with self._lock:
+                self._oversized += 1
+            return shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            return self._free_slots.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("No free inference slot") from None
+
+    def _release(self, slot):
+        if slot in self._slots:
+            self._free_slots.put(slot)
+        else:
+            slot.close()
+            slot.unlink()
+
+    def submit(self, model_name, image, **predict_kwargs):
+        """Sends a PIL image to the worker pool; returns a future for its `Detections` and the request id."""
+        pixels = np.asarray(image.convert('RGB'), dtype=np.uint8)
+        slot = self._acquire(pixels.nbytes)
+        np.ndarray(pixels.shape, dtype=np.uint8, buffer=slot.buf)[...] = pixels
+
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (future, slot, time.perf_counter())
+            self._requests_total += 1
+        self._requests.put((request_id, model_name, slot.name, pixels.shape, predict_kwargs))
+        return future, request_id
+
+    def detect(self, model_name, image, **predict_kwargs):
+        future, request_id = self.submit(model_name, image, **predict_kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                pending = self._pending.pop(request_id, None)
+                self._errors += 1
+            # A worker may still be reading the slot, so an abandoned slot is dropped rather than
+            # reused, and a fresh one takes its place so the pool never shrinks
+            if pending is not None:
+                self._replace_slot(pending[1])
+            raise
+
+    def _replace_slot(self, slot):
+        with self._lock:
+            pooled = slot in self._slots
+            if pooled:
+                self._slots.remove(slot)
+        slot.close()
+        slot.unlink()
+        if pooled:
+            replacement = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+            with self._lock:
+                self._slots.append(replacement)
+                self._replaced_slots += 1
+            self._free_slots.put(replacement)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._requests.put(None)
+        for process in self._processes:
+            if process is None:
+                continue
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+
+    def stats(self):
+        with self._lock:
+            completed = self._requests_total - len(self._pending)
+            return {
+                'workers': self.worker_count,
+                'alive': sum(1 for process in self._processes if process is not None and process.poll() is None),
+                'cpu_sets': [sorted(cpus) if cpus else None for cpus in self._cpu_sets],
+                'slots': len(self._slots),
+                'slot_bytes': self.slot_bytes,
+                'free_slots': self._free_slots.qsize(),
+                'requests': self._requests_total,
+                'in_flight': len(self._pending),
+                'errors': self._errors,
+                'oversized_images': self._oversized,
+                'restarts': self._restarts,
+                'replaced_slots': self._replaced_slots,
+                'avg_roundtrip_ms': round(self._total_roundtrip / completed * 1000, 2) if completed else 0,
+            }
+
+
+_inference_server = None
+_inference_server_lock = threading.Lock()
+
+
+def get_inference_server():
+    """Returns the process-wide inference server, starting its workers on first use."""
+    global _inference_server
+    if _inference_server is None:
+        with _inference_server_lock:
+            if _inference_server is None:
+                config = current_app.config
+                _inference_server = InferenceServer(
+                    workers=config['INFERENCE_SERVER_WORKERS'],
+                    slot_bytes=config.get('INFERENCE_SERVER_SLOT_BYTES', 3 * 1920 * 1920),
+                    pin_cpus=config.get('INFERENCE_SERVER_PIN_CPUS', False),
+                    timeout=config.get('INFERENCE_SERVER_TIMEOUT_SECONDS', 60),
+                )
+                atexit.register(_inference_server.close)
+    return _inference_server
+
+
+def inference_server_enabled():
+    return current_app.config.get('INFERENCE_SERVER_WORKERS', 0) > 0
+
+
+def inference_server_stats():
+    return _inference_server.stats() if _inference_server is not None else None
+
+
+if __name__ == '__main__':
+    main()
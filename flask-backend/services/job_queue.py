@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app, jsonify, request, url_for
+
+logger = logging.getLogger(__name__)
+
+# kind -> function(payload, data) returning a JSON-serializable result
+JOB_HANDLERS = {}
+
+
+def parse_callback_hosts(value):
+    """Parses the comma separated JOB_CALLBACK_HOSTS value into a set of lower-case host names."""
+    return {host.strip().lower() for host in (value or '').split(',') if host.strip()}
+
+
+def callback_allowed(callback_url, allowed_hosts):
+    """True for an http(s) URL whose host is on the allowlist; nothing is allowed when the list is empty."""
+    try:
+        parsed = urlparse(callback_url)
+    except ValueError:
+        return False
+    return parsed.scheme in ('http', 'https') and (parsed.hostname or '').lower() in allowed_hosts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT,
+    data BLOB,
+    result TEXT,
+    error TEXT,
+    callback_url TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+def job_handler(kind):
+    """Registers the function that runs jobs of `kind` on the worker pool."""
+    def register(function):
+        JOB_HANDLERS[kind] = function
+        return function
+    return register
+
+
+class JobQueue:
+    """
+    Persistent job queue stored in a local SQLite file.
+
+    Jobs are claimed inside an immediate transaction, so worker threads in any
+    number of processes (web processes and `flask run-jobs` workers) can share
+    one file. Each worker runs its handler inside an app context and stores the
+    result (or the error) on the job row; the uploaded data blob is dropped once
+    the job finishes. Every `cleanup_interval` seconds one of the workers expires
+    old results and requeues jobs left running by a worker that died.
+    """
+
+    def __init__(self, app, path, workers=2, poll_interval=1.0, result_ttl=24 * 3600, stale_after=600,
+                 cleanup_interval=60, callback_hosts=()):
+        self.app = app
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self.cleanup_interval = cleanup_interval
+        self.callback_hosts = set(callback_hosts)
+        self._next_cleanup = 0.0
+        self._cleanup_lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so each thread opens its own
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def submit(self, kind, payload=None, data=None, callback_url=None):
+        """Queues a job and returns its id."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, status, payload, data, callback_url, created_at) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload or {}), data, callback_url, time.time())
+        )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the public view of a job, or None if it does not exist (or has expired)."""
+        row = self._connection().execute(
+            "SELECT id, kind, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] is not None else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+
+    def claim(self):
+        """Marks the oldest queued job this process can run as running and returns its row."""
+        kinds = list(JOB_HANDLERS)
+        if not kinds:
+            return None
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                f"SELECT id, kind, payload, data, callback_url FROM jobs "
+                f"WHERE status = 'queued' AND kind IN ({','.join('?' * len(kinds))}) "
+                f"ORDER BY created_at LIMIT 1",
+                kinds
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row['id']))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def run(self, row):
+        """Runs a claimed job and records its outcome."""
+        result = None
+        error = None
+        try:
+            with self.app.app_context():
+                result = JOB_HANDLERS[row['kind']](json.loads(row['payload']), row['data'])
+            status = 'done'
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", row['id'], row['kind'])
+            status = 'failed'
+            error = str(e)
+
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, data = NULL, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), row['id'])
+        )
+        if row['callback_url']:
+            self._send_callback(row['callback_url'], row['id'])
+
+    def _send_callback(self, callback_url, job_id):
+        # Checked again here: the allowlist may have changed since the job was queued
+        if not callback_allowed(callback_url, self.callback_hosts):
+            logger.warning("Dropping callback for job %s: host of %s is not allowed", job_id, callback_url)
+            return
+        try:
+            # Redirects are not followed, so an allowed host cannot bounce the result elsewhere
+            requests.post(callback_url, json=self.get(job_id), timeout=10, allow_redirects=False)
+        except requests.RequestException as e:
+            logger.warning("Callback for job %s to %s failed: %s", job_id, callback_url, e)
+
+    def cleanup(self):
+        """Deletes finished jobs past the result TTL and requeues jobs whose worker died mid-run."""
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - self.result_ttl,))
+        connection.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running' AND started_at < ?",
+            (now - self.stale_after,))
+
+    def _maybe_cleanup(self):
+        if time.monotonic() < self._next_cleanup or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() >= self._next_cleanup:
+                self._next_cleanup = time.monotonic() + self.cleanup_interval
+                self.cleanup()
+        except sqlite3.Error as e:
+            logger.warning("Job cleanup failed: %s", e)
+        finally:
+            self._cleanup_lock.release()
+
+    def work(self):
+        """Worker loop: runs jobs until stopped, sleeping up to `poll_interval` when idle."""
+        while not self._stopping.is_set():
+            self._maybe_cleanup()
+            try:
+                row = self.claim()
+            except sqlite3.Error as e:
+                logger.warning("Could not claim a job: %s", e)
+                row = None
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self.run(row)
+
+    def start(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def stats(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {
+            'path': self.path,
+            'workers': len(self._threads),
+            'jobs': {status: count for status, count in rows},
+        }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(start_workers=True):
+    """
+    Returns the process-wide job queue, created from the app config on first use.
+
+    Worker threads are started here unless JOB_WORKERS is 0, in which case jobs
+    are only run by a separate `flask run-jobs` process.
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                config = current_app.config
+                _job_queue = JobQueue(
+                    current_app._get_current_object(),
+                    config.get('JOB_QUEUE_PATH') or os.path.join(os.getcwd(), 'jobs.sqlite3'),
+                    workers=config.get('JOB_WORKERS', 2),
+                    poll_interval=config.get('JOB_POLL_INTERVAL_SECONDS', 1.0),
+                    result_ttl=config.get('JOB_RESULT_TTL_SECONDS', 24 * 3600),
+                    stale_after=config.get('JOB_STALE_SECONDS', 600),
+                    cleanup_interval=config.get('JOB_CLEANUP_INTERVAL_SECONDS', 60),
+                    callback_hosts=parse_callback_hosts(config.get('JOB_CALLBACK_HOSTS')),
+                )
+                if start_workers and _job_queue.workers > 0:
+                    _job_queue.start()
+    return _job_queue
+
+
+def job_queue_stats():
+    return _job_queue.stats() if _job_queue is not None else None
+
+
+def wants_async():
+    """True when the client asked for background processing (?async=1)."""
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+
+def enqueue_job(kind, payload=None, data=None):
+    """
+    Queues a job for the current request and returns the 202 response pointing at its status.
+
+    An optional `?callback_url=` receives the finished job as a JSON POST; its
+    host must be listed in JOB_CALLBACK_HOSTS (callbacks are off when it is empty).
+    """
+    job_queue = get_job_queue()
+    callback_url = request.args.get('callback_url')
+    if callback_url and not callback_allowed(callback_url, job_queue.callback_hosts):
+        return jsonify({'error': 'callback_url must be an http(s) URL on an allowed host'}), 400
+
+    job_id = job_queue.submit(kind, payload, data, callback_url)
+    status_url = url_for('jobs.get_job', job_id=job_id, _external=True) if 'jobs' in current_app.blueprints else None
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': status_url}), 202
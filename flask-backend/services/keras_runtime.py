@@ -0,0 +1,53 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Inputs with more rows than this go through Keras' regular predict loop
+SMALL_BATCH_LIMIT = 64
+
+
+class CompiledKerasModel:
+    """
+    Wraps a Keras model with a traced `tf.function` call path for small batches.
+
+    `model.predict()` builds a dataset, runs callbacks and a progress bar for every
+    call, which costs far more than the math for a single sample. Small inputs
+    call the traced graph directly instead; larger inputs still use `predict()`
+    so batching and memory behaviour stay the same.
+    """
+
+    def __init__(self, model, small_batch_limit=SMALL_BATCH_LIMIT):
+        import tensorflow as tf
+
+        self.model = model
+        self.small_batch_limit = small_batch_limit
+        self.input_shape = tuple(model.input_shape)
+
+        # A fixed signature with an open batch dimension means the graph is traced only once
+        signature = [tf.TensorSpec(shape=(None,) + self.input_shape[1:], dtype=tf.float32)]
+        self._call = tf.function(lambda x: model(x, training=False), input_signature=signature)
+
+    def predict(self, x, **kwargs):
+        x = np.asarray(x.to_numpy() if hasattr(x, 'to_numpy') else x, dtype=np.float32)
+        if len(x) > self.small_batch_limit:
+            return self.model.predict(x, **kwargs)
+        return self._call(x).numpy()
+
+    def warm_up(self):
+        """Runs one dummy sample so the graph is traced before the first real request."""
+        self.predict(np.zeros((1,) + self.input_shape[1:], dtype=np.float32))
+
+    def __getattr__(self, name):
+        # Anything else (summary, layers, ...) is served by the wrapped model
+        return getattr(self.model, name)
+
+
+def load_compiled_keras_model(path):
+    import tensorflow as tf
+
+    compiled = CompiledKerasModel(tf.keras.models.load_model(path))
+    compiled.warm_up()
+    logger.info("Compiled inference path ready for %s (input shape %s)", path, compiled.input_shape)
+    return compiled
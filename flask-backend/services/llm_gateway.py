@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import threading
+from contextlib import closing, contextmanager
+
+from flask import current_app
+
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when a provider already has the maximum number of requests in flight."""
+
+
+def close_gemini_stream(response):
+    """
+    Stops a streaming Gemini response that may not have been read to the end.
+
+    GenerateContentResponse has no close(); its underlying iterator is a gRPC call
+    (cancel()) or, with the REST transport, an api-core ResponseIterator holding
+    the open HTTP response, so whichever of those is present is shut down.
+    """
+    iterator = getattr(response, '_iterator', None)
+    if iterator is None:
+        return
+    try:
+        if hasattr(iterator, 'cancel'):
+            iterator.cancel()
+        elif hasattr(iterator, 'close'):
+            iterator.close()
+        http_response = getattr(iterator, '_response', None)
+        if http_response is not None:
+            http_response.close()
+    except Exception as e:
+        logger.warning("Could not close Gemini stream: %s", e)
+
+
+class ProviderLimiter:
+    """Caps concurrent requests to one provider; callers wait up to `queue_timeout` for a slot."""
+
+    def __init__(self, name, max_in_flight, queue_timeout):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise LLMBusyError(f"Too many concurrent {self.name} requests")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight, 'rejected': self.rejected}
+
+
+class LLMGateway:
+    """
+    Shared access point for the OpenAI and Gemini APIs.
+
+    One pooled HTTP client per provider (and per Gemini API key) is reused for
+    every request, each call carries a timeout, and each provider has a cap on
+    requests in flight so a slow provider can only tie up that many workers.
+    `OPENAI_BASE_URL` / `GEMINI_BASE_URL` point the clients at a local stub
+    server for tests and benchmarks.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.timeout = config.get('LLM_TIMEOUT_SECONDS', 30)
+        self.limiters = {
+            provider: ProviderLimiter(
+                provider,
+                config.get('LLM_MAX_IN_FLIGHT', 8),
+                config.get('LLM_QUEUE_TIMEOUT_SECONDS', 5)
+            )
+            for provider in ('openai', 'gemini')
+        }
+        self._openai_client = None
+        self._gemini_models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            with self._lock:
+                if self._openai_client is None:
+                    import httpx
+                    from openai import OpenAI
+
+                    pool_size = self.config.get('LLM_POOL_CONNECTIONS', 20)
+                    self._openai_client = OpenAI(
+                        api_key=self.config.get('OPENAI_API_KEY'),
+                        base_url=self.config.get('OPENAI_BASE_URL') or None,
+                        timeout=self.timeout,
+                        max_retries=self.config.get('LLM_MAX_RETRIES', 2),
+                        http_client=httpx.Client(
+                            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                            timeout=self.timeout
+                        )
+                    )
+        return self._openai_client
+
+    def chat_completion(self, messages, model="gpt-4o", **kwargs):
+        """Runs an OpenAI chat completion and returns the full completion object."""
+        with self.limiters['openai'].slot(), timed('llm_openai'):
+            return self.openai_client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+    def stream_chat_deltas(self, messages, model="gpt-4o", **kwargs):
+        """
+        Yields the deltas of a streamed OpenAI chat completion as they arrive.
+
+        Each delta may carry text (`content`) and, when tools were offered, pieces
+        of the requested tool calls (`tool_calls`). The provider slot is held until
+        the generator finishes or is closed; closing it early (e.g. the client
+        disconnected) also closes the upstream HTTP stream so no more tokens are
+        generated and billed.
+        """
+        with self.limiters['openai'].slot(), timed('llm_openai_stream'):
+            stream = self.openai_client.chat.completions.create(
+                model=model, messages=messages, stream=True, **kwargs)
+            try:
+                for chunk in stream:
+                    if chunk.choices:
+                        yield chunk.choices[0].delta
+            finally:
+                stream.close()
+
+    def stream_chat_completion(self, messages, model="gpt-4o", **kwargs):
+        """Yields the text of an OpenAI chat completion as it is generated; see stream_chat_deltas."""
+        with closing(self.stream_chat_deltas(messages, model, **kwargs)) as deltas:
+            for delta in deltas:
+                if delta.content:
+                    yield delta.content
+
+    def gemini_model(self, api_key, model_name="gemini-pro"):
+        """
+        Returns a cached Gemini model bound to its own client for `api_key`.
+
+        `google.generativeai.configure()` sets one global key, which is not safe when
+        blueprints use different keys from concurrent threads, so each key gets its
+        own client instead of reconfiguring the module on every request.
+        """
+        key = (api_key, model_name)
+        model = self._gemini_models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._gemini_models.get(key)
+                if model is None:
+                    import google.generativeai as google_gen_ai
+                    from google.ai import generativelanguage as glm
+
+                    client_options = {'api_key': api_key}
+                    if self.config.get('GEMINI_BASE_URL'):
+                        client_options['api_endpoint'] = self.config['GEMINI_BASE_URL']
+                    model = google_gen_ai.GenerativeModel(model_name)
+                    # GenerativeModel has no public way to take a client, so its private `_client` is
+                    # replaced. This relies on google-generativeai==0.8.4 (pinned in requirements.txt);
+                    # check the attribute still exists before upgrading the SDK.
+                    if not hasattr(model, '_client'):
+                        raise RuntimeError("google.generativeai.GenerativeModel no longer has _client; "
+                                           "update LLMGateway.gemini_model for this SDK version")
+                    model._client = glm.GenerativeServiceClient(client_options=client_options, transport='rest')
+                    self._gemini_models[key] = model
+        return model
+
+    def gemini_generate(self, api_key, prompt, model_name="gemini-pro"):
+        """Runs a Gemini generate_content call and returns the response."""
+        model = self.gemini_model(api_key, model_name)
+        with self.limiters['gemini'].slot(), timed('llm_gemini'):
+            return model.generate_content(prompt, request_options={'timeout': self.timeout})
+
+    def stream_gemini_generate(self, api_key, prompt, model_name="gemini-pro"):
+        """
+        Yields the text of a Gemini response as it is generated.
+
+        Like stream_chat_completion, closing the generator early cancels the
+        upstream stream before the provider slot is released.
+        """
+        model = self.gemini_model(api_key, model_name)
+        with self.limiters['gemini'].slot(), timed('llm_gemini_stream'):
+            response = model.generate_content(prompt, stream=True, request_options={'timeout': self.timeout})
+            try:
+                for chunk in response:
+                    if chunk.parts:
+                        yield chunk.text
+            finally:
+                close_gemini_stream(response)
+
+    async def achat_completion(self, messages, model="gpt-4o", **kwargs):
+        """Async variant of chat_completion; the blocking call runs in a worker thread."""
+        return await asyncio.to_thread(self.chat_completion, messages, model, **kwargs)
+
+    async def agemini_generate(self, api_key, prompt, model_name="gemini-pro"):
+        """Async variant of gemini_generate; the blocking call runs in a worker thread."""
+        return await asyncio.to_thread(self.gemini_generate, api_key, prompt, model_name)
+
+    def stats(self):
+        return {provider: limiter.stats() for provider, limiter in self.limiters.items()}
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    """Returns the process-wide LLM gateway, created from the app config on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(current_app.config)
+    return _gateway
+
+
+def llm_gateway_stats():
+    return _gateway.stats() if _gateway is not None else None
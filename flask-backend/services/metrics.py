@@ -0,0 +1,169 @@
+import bisect
+import contextlib
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = False
+_null_timer = contextlib.nullcontext()
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets, in the Prometheus sense."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """Histograms keyed by metric name and a tuple of (label, value) pairs."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    def render(self):
+        lines = []
+        seen = set()
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+metrics_registry = MetricsRegistry()
+
+
+class _StageTimer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics_registry.observe('app_stage_duration_seconds', (('stage', self.stage),),
+                                 time.perf_counter() - self.started)
+        return False
+
+
+def timed(stage):
+    """
+    Times the enclosed block into the `app_stage_duration_seconds{stage=...}` histogram.
+
+    When metrics are disabled this returns a shared no-op context manager, so
+    instrumented code pays only for one function call and a flag check.
+    """
+    return _StageTimer(stage) if _enabled else _null_timer
+
+
+def metrics_enabled():
+    return _enabled
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_samples(kind, name, samples):
+    lines = [f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is not None:
+            lines.append(f"{name}{_format_labels(tuple(labels.items()))} {float(value)}")
+    return lines if len(lines) > 1 else []
+
+
+def format_gauges(name, samples):
+    """Renders (labels dict, value) samples as Prometheus gauge lines; None values are skipped."""
+    return _format_samples('gauge', name, samples)
+
+
+def format_counters(name, samples):
+    """Like format_gauges, for monotonic `*_total` series, typed as counters."""
+    return _format_samples('counter', name, samples)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        metrics_registry.observe(
+            'http_request_duration_seconds',
+            (('endpoint', request.endpoint or 'unmatched'), ('method', request.method),
+             ('status', str(response.status_code))),
+            time.perf_counter() - started
+        )
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('metrics_query_started', None)
+    if started is not None:
+        metrics_registry.observe('app_stage_duration_seconds', (('stage', 'db_query'),),
+                                 time.perf_counter() - started)
+
+
+def init_metrics(app):
+    """Turns on request, stage and database query timing when METRICS_ENABLED is set."""
+    global _enabled
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    _enabled = True
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+
+from services.keras_runtime import load_compiled_keras_model
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Loads AI models on first use instead of at import time.
+
+    Each model is registered with a loader function and the path of its weights
+    file. The loader only runs the first time `get()` is called (or during an
+    explicit `warm_up()`), so processes that never serve a model never pay for it.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._paths = {}
+        self._models = {}
+        self._load_times = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._model_locks = {}
+
+    def register(self, name, path, loader):
+        """Registers a model `name` whose weights at `path` are loaded by `loader(path)`."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._paths[name] = path
+            self._model_locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Returns the loaded model, loading it first if needed."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        # Only one thread loads a given model; the others wait for it
+        with self._model_locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            path = self._paths[name]
+            logger.info("Loading model '%s' from %s", name, path)
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name](path)
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error("Error loading model '%s': %s", name, e)
+                raise RuntimeError(f"Model '{name}' failed to load") from e
+
+            self._load_times[name] = time.perf_counter() - start
+            self._errors.pop(name, None)
+            self._models[name] = model
+            logger.info("Model '%s' loaded in %.2fs", name, self._load_times[name])
+            return model
+
+    def warm_up(self, names=None):
+        """Loads the given models (all registered models if `names` is None)."""
+        for name in names if names is not None else list(self._loaders):
+            try:
+                self.get(name)
+            except RuntimeError:
+                # The error is recorded in status(); keep warming the others
+                pass
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def version(self, name):
+        """Returns an identifier that changes whenever the model file on disk changes."""
+        try:
+            stat = os.stat(self._paths[name])
+        except (KeyError, OSError):
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def status(self):
+        return {
+            name: {
+                'loaded': name in self._models,
+                'load_time_seconds': round(self._load_times[name], 3) if name in self._load_times else None,
+                'error': self._errors.get(name),
+                'path': self._paths[name],
+            }
+            for name in self._loaders
+        }
+
+
+def _load_yolo_model(path):
+    from ultralytics import YOLO
+    return YOLO(path)
+
+
+model_registry = ModelRegistry()
+
+model_registry.register(
+    'food_classifier', os.path.join(os.getcwd(), 'aimodels/food/food_classifier_model.keras'), load_compiled_keras_model)
+model_registry.register(
+    'food_ingredients', os.path.join(os.getcwd(), 'aimodels/food/ingredient_detection_best.pt'), _load_yolo_model)
+model_registry.register(
+    'dp', os.path.join(os.getcwd(), 'aimodels/DP/dp_model.h5'), load_compiled_keras_model)
+model_registry.register(
+    'acne', os.path.join(os.getcwd(), 'aimodels/acne/best.pt'), _load_yolo_model)
+model_registry.register(
+    'oha', os.path.join(os.getcwd(), 'aimodels/oha/best.pt'), _load_yolo_model)
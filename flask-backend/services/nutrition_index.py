@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+
+from models.ingredient import Ingredient
+
+logger = logging.getLogger(__name__)
+
+
+class NutritionIndex:
+    """
+    In-memory copy of the `ingredients` table keyed by ingredient name.
+
+    The table is tiny and read on every food scan, so it is loaded with a single
+    query and served from memory. It is reloaded when an ingredient is added
+    through this process, and after `ttl` seconds so other workers pick up
+    changes too.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._by_name = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        by_name = {}
+        # Lowest id wins when a name appears more than once, like filter_by(name=...).first()
+        for ingredient in Ingredient.query.order_by(Ingredient.id).all():
+            by_name.setdefault(ingredient.name, {
+                "name": ingredient.name,
+                "calories": ingredient.calories,
+                "carb": ingredient.carb,
+                "protein": ingredient.protein,
+                "fat": ingredient.fat,
+                "increment_type": ingredient.increment_type
+            })
+        self._by_name = by_name
+        self._loaded_at = time.monotonic()
+        logger.info("Loaded nutrition index with %d ingredients", len(by_name))
+
+    def _ensure_loaded(self):
+        if self._by_name is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        with self._lock:
+            if self._by_name is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._load()
+
+    def get(self, name):
+        """Returns the nutritional data for an ingredient name, or None if unknown."""
+        self._ensure_loaded()
+        return self._by_name.get(name)
+
+    def refresh(self):
+        with self._lock:
+            self._load()
+
+
+nutrition_index = NutritionIndex()
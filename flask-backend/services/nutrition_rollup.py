@@ -0,0 +1,113 @@
+import logging
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from extensions import db
+from models.daily_nutrition import DailyNutrition
+from models.foodscan import NUTRIENT_KEYS, FoodScan
+
+logger = logging.getLogger(__name__)
+
+# Rollup columns that are sums over the day's scans
+COUNTERS = ('scans',) + tuple(NUTRIENT_KEYS)
+
+
+def _value(scan, column):
+    return scan[column] if isinstance(scan, dict) else getattr(scan, column)
+
+
+def _deltas(scans):
+    """Sums FoodScans (objects or row dicts) into one delta per (user_id, day)."""
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for scan in scans:
+        delta = deltas[(_value(scan, 'user_id'), _value(scan, 'timestamp').date())]
+        delta['scans'] += 1
+        for column in NUTRIENT_KEYS:
+            delta[column] += _value(scan, column) or 0
+    return [{'user_id': user_id, 'day': day, **delta} for (user_id, day), delta in deltas.items()]
+
+
+def _upsert_statement(dialect):
+    """INSERT that adds to the existing (user_id, day) row instead, in the dialect's own syntax."""
+    table = DailyNutrition.__table__
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update({column: table.c[column] + statement.inserted[column]
+                                                  for column in COUNTERS})
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=['user_id', 'day'],
+            set_={column: table.c[column] + statement.excluded[column] for column in COUNTERS}
+        )
+    return None
+
+
+def add_scans(scans):
+    """
+    Adds new FoodScans to their users' daily rollups, in the caller's transaction.
+
+    Scans are grouped per user and day first, so a batch touches each rollup row
+    once. The timestamps must already be set on the scans.
+    """
+    deltas = _deltas(scans)
+    if not deltas:
+        return
+    statement = _upsert_statement(db.session.get_bind().dialect.name)
+    if statement is not None:
+        db.session.execute(statement, deltas)
+        return
+
+    # No native upsert: update the row, or insert it when there was none
+    table = DailyNutrition.__table__
+    for delta in deltas:
+        result = db.session.execute(
+            update(table)
+            .where(table.c.user_id == delta['user_id'], table.c.day == delta['day'])
+            .values({column: table.c[column] + delta[column] for column in COUNTERS})
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**delta))
+
+
+def remove_scans(scans):
+    """Subtracts deleted FoodScans from their daily rollups and drops days left without scans."""
+    table = DailyNutrition.__table__
+    for delta in _deltas(scans):
+        where = (table.c.user_id == delta['user_id'], table.c.day == delta['day'])
+        db.session.execute(
+            update(table).where(*where).values({column: table.c[column] - delta[column] for column in COUNTERS})
+        )
+        db.session.execute(delete(table).where(*where, table.c.scans <= 0))
+
+
+def rebuild_rollups(user_id=None):
+    """
+    Recomputes the daily rollups from food_scans, for one user or everyone, and commits.
+
+    The totals are summed by the database with a single INSERT ... SELECT.
+    Returns the number of rollup rows written.
+    """
+    table = DailyNutrition.__table__
+    day = func.date(FoodScan.timestamp)
+    source = (
+        select(FoodScan.user_id, day, func.count(FoodScan.id),
+               *[func.sum(getattr(FoodScan, column)) for column in NUTRIENT_KEYS])
+        .group_by(FoodScan.user_id, day)
+    )
+    clear = delete(table)
+    if user_id is not None:
+        source = source.where(FoodScan.user_id == user_id)
+        clear = clear.where(table.c.user_id == user_id)
+
+    try:
+        db.session.execute(clear)
+        result = db.session.execute(insert(table).from_select(['user_id', 'day', *COUNTERS], source))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info("Rebuilt %s daily nutrition rollup rows", result.rowcount)
+    return result.rowcount
@@ -0,0 +1,135 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import Response, request, stream_with_context
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+STREAM_CHUNK_SIZE = 200
+
+# items: serialized records, next_cursor: cursor for the following page (None on the last page),
+# paginated: False when the client sent neither limit nor cursor and expects the legacy bare list
+Page = namedtuple('Page', ['items', 'next_cursor', 'paginated'])
+
+
+class PaginationError(ValueError):
+    """Raised for an invalid limit, cursor or field list; routes return it as a 400."""
+
+
+def encode_cursor(timestamp, record_id):
+    payload = json.dumps([timestamp.isoformat() if timestamp else None, record_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(record_id)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+
+def get_selected_fields(fields):
+    """
+    Returns the output fields requested with `?fields=a,b,c`, or all of them.
+
+    `fields` maps each output name to a `(model attribute, formatter)` pair, where
+    the formatter (or None) converts the attribute value for JSON.
+    """
+    requested = request.args.get('fields')
+    if not requested:
+        return list(fields)
+
+    selected = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in fields]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def serialize(record, fields, selected):
+    result = {}
+    for name in selected:
+        attribute, formatter = fields[name]
+        value = getattr(record, attribute)
+        result[name] = formatter(value) if formatter and value is not None else value
+    return result
+
+
+def _project(query, model, fields, selected, timestamp_attribute):
+    # Only load the columns that are actually returned (plus the keyset columns)
+    attributes = {fields[name][0] for name in selected} | {timestamp_attribute, 'id'}
+    return query.options(load_only(*[getattr(model, attribute) for attribute in attributes]))
+
+
+def _ordered(query, model, timestamp_attribute):
+    return query.order_by(getattr(model, timestamp_attribute).desc(), model.id.desc())
+
+
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true')
+
+
+def paginate_records(query, model, timestamp_attribute, fields):
+    """
+    Applies field projection and keyset pagination.
+
+    Pages are ordered newest first by `(timestamp, id)`; the cursor encodes the
+    last row of the previous page, so each page costs the same no matter how
+    deep the client has paged. Requests without `limit` or `cursor` keep the
+    legacy contract: every row, in the same order, as a bare list (clients with
+    long histories should page or use `?stream=1`).
+    """
+    selected = get_selected_fields(fields)
+    query = _project(query, model, fields, selected, timestamp_attribute)
+    paginated = 'limit' in request.args or 'cursor' in request.args
+
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        raise PaginationError("limit must be a positive integer")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    timestamp_column = getattr(model, timestamp_attribute)
+    cursor = request.args.get('cursor')
+    if cursor:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        if cursor_timestamp is None:
+            # Rows without a timestamp sort last in descending order
+            query = query.filter(timestamp_column.is_(None), model.id < cursor_id)
+        else:
+            query = query.filter(or_(
+                timestamp_column < cursor_timestamp,
+                and_(timestamp_column == cursor_timestamp, model.id < cursor_id),
+                timestamp_column.is_(None)
+            ))
+
+    if not paginated:
+        records = _ordered(query, model, timestamp_attribute).all()
+        return Page([serialize(record, fields, selected) for record in records], None, False)
+
+    records = _ordered(query, model, timestamp_attribute).limit(limit + 1).all()
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_attribute), last.id)
+
+    return Page([serialize(record, fields, selected) for record in records], next_cursor, paginated)
+
+
+def stream_records(query, model, timestamp_attribute, fields):
+    """Streams every matching record as one JSON array without building it in memory."""
+    selected = get_selected_fields(fields)
+    query = _ordered(_project(query, model, fields, selected, timestamp_attribute), model, timestamp_attribute)
+
+    def generate():
+        yield '['
+        for index, record in enumerate(query.yield_per(STREAM_CHUNK_SIZE)):
+            yield (',' if index else '') + json.dumps(serialize(record, fields, selected), default=str)
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
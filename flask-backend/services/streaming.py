@@ -0,0 +1,43 @@
+import json
+import logging
+
+from flask import Response, jsonify
+
+from services.llm_gateway import LLMBusyError
+
+logger = logging.getLogger(__name__)
+
+
+def sse_response(chunks):
+    """
+    Streams text chunks to the client as server-sent events.
+
+    Each chunk is sent as `data: {"token": ...}`, followed by a final `done` event
+    (or an `error` event). The first chunk is read before the response starts, so
+    errors such as a busy provider still return a normal JSON error status. When
+    the client disconnects the server closes this generator, which closes
+    `chunks` and with it the upstream provider stream.
+    """
+    try:
+        first_chunk = next(chunks, None)
+    except LLMBusyError as e:
+        return jsonify({"error": str(e)}), 503
+
+    def generate():
+        try:
+            if first_chunk is not None:
+                yield f"data: {json.dumps({'token': first_chunk})}\n\n"
+            for chunk in chunks:
+                yield f"data: {json.dumps({'token': chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            logger.error("Error while streaming response: %s", e)
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            chunks.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })